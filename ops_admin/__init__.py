@@ -0,0 +1 @@
+default_app_config = 'ops_admin.apps.OpsAdminConfig'
@@ -1,9 +1,151 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db.models import Max, Min
+from django.utils.functional import cached_property
+
 from .models import Order, Retailer, Supplier, Concession, Memo, ManualOrder
+from .search import matching
+
+# Tables smaller than this are counted exactly even unfiltered, it's cheap enough and the page links come out right.
+EXACT_BELOW = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+
+    """
+    An unfiltered changelist is counted from the primary key range, two index lookups, instead of a COUNT(*) over
+    the whole table. That is over by however many rows have been deleted, so the last page links may point past the
+    end (the admin then goes back to page one). A filtered changelist is counted exactly, over the index its
+    list_filters use.
+    """
+
+    @cached_property
+    def count(self):
+
+        queryset = self.object_list
+        if not queryset.query.where:
+            # Separate queries, SQLite only answers a lone MIN() or MAX() from the index.
+            rows = queryset.model._base_manager.using(queryset.db)
+            high = rows.aggregate(high=Max('pk'))['high']
+            if high is None:
+                return 0
+            estimate = high - rows.aggregate(low=Min('pk'))['low'] + 1
+            if estimate >= EXACT_BELOW:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+
+    """
+    Base for the ops tables: estimated counts, no second count of the whole table for "(n total)", and foreign
+    keys as raw id inputs rather than a <select> of every row.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ('owner',)
+
+
+class CodeListFilter(admin.SimpleListFilter):
+
+    """
+    Order stores retailer/supplier codes rather than foreign keys. Reads the choices from the small Retailer/Supplier
+    tables, the default filter would take a DISTINCT over every order on every page.
+    """
+
+    model = None
+
+    def lookups(self, request, model_admin):
+
+        return list(self.model.objects.order_by('code').values_list('code', 'name'))
+
+    def queryset(self, request, queryset):
+
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class RetailerCodeFilter(CodeListFilter):
+
+    title = 'retailer'
+    parameter_name = 'retailer'
+    model = Retailer
+
+
+class SupplierCodeFilter(CodeListFilter):
+
+    title = 'supplier'
+    parameter_name = 'supplier'
+    model = Supplier
+
+
+@admin.register(Order)
+class OrderAdmin(LargeTableAdmin):
+
+    """Newest first, read straight off the recieved index. Filters and search all hit an Order index."""
+
+    list_display = ('ordernum', 'retailer', 'supplier', 'recieved', 'updated_at')
+    list_filter = (RetailerCodeFilter, SupplierCodeFilter, 'recieved')
+    search_fields = ('ordernum__exact',)
+    ordering = ('-recieved', '-id')
+
+
+@admin.register(Retailer)
+class RetailerAdmin(LargeTableAdmin):
+
+    list_display = ('code', 'name', 'updated_at')
+    search_fields = ('code__exact', 'name')
+    raw_id_fields = ('owner', 'list')
+
+
+@admin.register(Supplier)
+class SupplierAdmin(LargeTableAdmin):
+
+    list_display = ('code', 'name', 'updated_at')
+    search_fields = ('code__exact', 'name')
+
+
+class NoteAdmin(LargeTableAdmin):
+
+    """
+    Concessions, memos and manual orders. Their __str__ shows the retailer and supplier, so those come in with the
+    rows. search_fields are the columns in the full text index (ops_admin.search), which answers the search
+    instead of a LIKE '%...%' scan.
+    """
+
+    list_select_related = ('retailer', 'supplier')
+    raw_id_fields = ('owner', 'retailer', 'supplier')
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+
+        return matching(queryset, self.search_kind, search_term), False
+
+
+@admin.register(Concession)
+class ConcessionAdmin(NoteAdmin):
+
+    list_display = ('product', 'retailer', 'supplier', 'best_before', 'start_date', 'end_date')
+    list_filter = ('retailer', 'supplier', 'start_date', 'end_date', 'best_before')
+    search_fields = ('product', 'description')
+    search_kind = 'concessions'
+
+
+@admin.register(Memo)
+class MemoAdmin(NoteAdmin):
+
+    list_display = ('__str__', 'start_date', 'end_date')
+    list_filter = ('retailer', 'supplier', 'start_date', 'end_date')
+    search_fields = ('content',)
+    search_kind = 'memos'
+
+
+@admin.register(ManualOrder)
+class ManualOrderAdmin(NoteAdmin):
 
-admin.site.register(Order)
-admin.site.register(Retailer)
-admin.site.register(Supplier)
-admin.site.register(Concession)
-admin.site.register(Memo)
-admin.site.register(ManualOrder)
\ No newline at end of file
+    list_display = ('__str__', 'processing')
+    list_filter = ('retailer', 'supplier', 'processing')
+    search_fields = ('details',)
+    search_kind = 'manual orders'
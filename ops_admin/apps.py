@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class OpsAdminConfig(AppConfig):
     name = 'ops_admin'
+
+    def ready(self):
+        from ops_admin import signals, tasks  # noqa: F401
@@ -0,0 +1,94 @@
+"""
+Read only async versions of the list/detail endpoints, for running under webapi.asgi.
+
+DRF's @api_view functions are sync, so under an ASGI server the whole request (authentication, permissions, ORM,
+serialization) is handed across to a thread. These views stay on the event loop and make exactly one hop per request,
+for the database and serialization work. The ORM in the pinned Django 3.1 has no async query API, so that one hop
+is as close to a native async read as it gets - swap the sync_to_async blocks for the async ORM after upgrading.
+The JSON is the same as the sync views render (next/previous links aside), and so are the permissions and filters.
+"""
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import APIException, NotAuthenticated, PermissionDenied
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, IsAuthenticatedOrReadOnly
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from ops_admin.filters import OrderFilter, RetailerFilter, SupplierFilter, ConcessionFilter, MemoFilter
+from ops_admin.models import Order, Retailer, Supplier, Concession, Memo
+from ops_admin.pagination import IdCursorPagination, RecievedCursorPagination, paginated
+from ops_admin.serializers import OrderSerializer, RetailerSerializer, SupplierSerializer, ConcessionSerializer, \
+                                    MemoSerializer, sparse_fields
+
+RESOURCES = {
+    'orders': (Order, OrderSerializer, IsAdminUser, RecievedCursorPagination, OrderFilter),
+    'retailers': (Retailer, RetailerSerializer, IsAuthenticated, IdCursorPagination, RetailerFilter),
+    'suppliers': (Supplier, SupplierSerializer, IsAuthenticated, IdCursorPagination, SupplierFilter),
+    'concessions': (Concession, ConcessionSerializer, IsAuthenticatedOrReadOnly, IdCursorPagination, ConcessionFilter),
+    'memos': (Memo, MemoSerializer, IsAuthenticatedOrReadOnly, IdCursorPagination, MemoFilter),
+}
+
+
+def authorize(request, permission_class):
+
+    """Authenticate with the configured DRF authenticators and check permission, as APIView.initial() would."""
+
+    request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    if not permission_class().has_permission(request, None):
+        raise NotAuthenticated() if request.user is None or not request.user.is_authenticated else PermissionDenied()
+    return request
+
+
+def read(func):
+
+    """
+    Run func(request, ...) -> (status, data) in a worker thread and render the result as JSON back on the event loop.
+    Connections are recycled at both ends as the request_started/finished signals would do, honouring CONN_MAX_AGE.
+    """
+
+    def sync(request, **kwargs):
+
+        close_old_connections()
+        try:
+            return func(request, **kwargs)
+        except APIException as exc:
+            return exc.status_code, {'detail': exc.detail}
+        finally:
+            close_old_connections()
+
+    async def view(request, **kwargs):
+
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        status, data = await sync_to_async(sync, thread_sensitive=False)(request, **kwargs)
+        content = JSONRenderer().render(data)
+        return HttpResponse(content, status=status, content_type='application/json')
+
+    view.__name__ = func.__name__
+    return view
+
+
+@read
+def resource_list(request, resource):
+
+    model, serializer_class, permission_class, pagination_class, filter_class = RESOURCES[resource]
+    request = authorize(request, permission_class)
+    filters = filter_class.from_request(request)
+    queryset = serializer_class.setup_eager_loading(filters.filter(model.objects.all()), **sparse_fields(request))
+    return 200, paginated(request, queryset, serializer_class, pagination_class, filters.order_by()).data
+
+
+@read
+def resource_detail(request, resource, pk):
+
+    model, serializer_class, permission_class, pagination_class, filter_class = RESOURCES[resource]
+    request = authorize(request, permission_class)
+    fields = sparse_fields(request)
+    try:
+        instance = serializer_class.setup_eager_loading(model.objects.all(), **fields).get(pk=pk)
+    except model.DoesNotExist:
+        return 404, None
+    return 200, serializer_class(instance, **fields).data
@@ -0,0 +1,151 @@
+import hashlib
+import io
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+
+from ops_admin.jobs import enqueue
+from ops_admin.models import Attachment, ManualOrder
+
+BLOCK_SIZE = 64 * 1024
+TEXT_LIMIT = 100 * 1024
+THUMBNAIL_SIZE = (200, 200)
+
+
+def partial_path(upload):
+
+    path = Path(settings.MEDIA_ROOT) / 'uploads' / 'partial'
+    path.mkdir(parents=True, exist_ok=True)
+    return path / str(upload.pk)
+
+
+def receive_chunk(upload, stream):
+
+    """
+    Copy a request body to a file of its own next to the partial file, BLOCK_SIZE bytes at a time so no more than
+    one block is held in memory, stopping at upload.size. Returns the file and how many bytes arrived - whatever
+    did arrive is kept, so an interrupted chunk can be resumed from there. Two PUTs of the same range each write
+    their own file, only the one that claims the offset gets appended (append_chunk).
+    """
+
+    path = partial_path(upload).with_name(f'{upload.pk}.{uuid.uuid4().hex}')
+    received = 0
+    remaining = upload.size - upload.offset
+    with open(path, 'wb') as chunk:
+        while stream is not None and received < remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining - received))
+            if not block:
+                break
+            chunk.write(block)
+            received += len(block)
+    return path, received
+
+
+def append_chunk(upload, path):
+
+    """Move a received chunk onto the end of the partial file at upload.offset, once the offset is claimed."""
+
+    with open(partial_path(upload), 'ab') as partial, open(path, 'rb') as chunk:
+        partial.truncate(upload.offset)
+        shutil.copyfileobj(chunk, partial, BLOCK_SIZE)
+    os.remove(path)
+
+
+def file_digest(path):
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finish_upload(upload):
+
+    """
+    Turn a complete partial file into an Attachment, reusing the existing one if the same content has been
+    uploaded before, and point the upload's manual order at it. Processing is left to the job worker.
+    """
+
+    path = partial_path(upload)
+    digest = file_digest(path)
+    attachment = Attachment.objects.filter(sha256=digest).first()
+    if attachment is None:
+        extension = os.path.splitext(upload.filename)[1].lower()
+        attachment = Attachment(sha256=digest, size=upload.size, content_type=upload.content_type)
+        with open(path, 'rb') as handle:
+            attachment.file.save(f'{digest[:2]}/{digest}{extension}', File(handle), save=False)
+        try:
+            with transaction.atomic():
+                attachment.save()
+        except IntegrityError:
+            # The same file finished uploading on another request in the meantime.
+            attachment.file.delete(save=False)
+            attachment = Attachment.objects.get(sha256=digest)
+        else:
+            enqueue('process_attachment', pk=attachment.pk)
+    os.remove(path)
+    upload.attachment = attachment
+    manual = ManualOrder.objects.filter(pk=upload.manual_id).first() if upload.manual_id is not None else None
+    if manual is not None:
+        # save() rather than update() so updated_at moves (for /sync/) and the signals see the change.
+        manual.attachments = attachment.file.name
+        manual.save(update_fields=['attachments', 'updated_at'])
+    return attachment
+
+
+def process_attachment(pk):
+
+    """
+    Pull searchable text out of text and PDF attachments and make thumbnails of images. PDF text needs pypdf and
+    thumbnails need Pillow, both optional - without them those attachments are just marked processed. Anything
+    else (scanned PDFs with no text layer included) is stored as is.
+    """
+
+    attachment = Attachment.objects.get(pk=pk)
+    if attachment.content_type.startswith('text/'):
+        with attachment.file.open('rb') as handle:
+            attachment.text = handle.read(TEXT_LIMIT).decode('utf-8', errors='replace')
+    elif attachment.content_type == 'application/pdf':
+        attachment.text = pdf_text(attachment)
+    elif attachment.content_type.startswith('image/'):
+        attachment.thumbnail = make_thumbnail(attachment) or ''
+    attachment.processed = True
+    attachment.save(update_fields=['text', 'thumbnail', 'processed'])
+
+
+def pdf_text(attachment):
+
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return ''
+    text = ''
+    with attachment.file.open('rb') as handle:
+        for page in PdfReader(handle).pages:
+            text += page.extract_text() + '\n'
+            if len(text) >= TEXT_LIMIT:
+                break
+    return text[:TEXT_LIMIT].strip()
+
+
+def make_thumbnail(attachment):
+
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with attachment.file.open('rb') as handle:
+        image = Image.open(handle)
+        image.thumbnail(THUMBNAIL_SIZE)
+        buffer = io.BytesIO()
+        image.convert('RGB').save(buffer, 'JPEG')
+    thumbnail = ContentFile(buffer.getvalue())
+    thumbnail.name = f'{attachment.sha256}.jpg'
+    return thumbnail
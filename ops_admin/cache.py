@@ -0,0 +1,78 @@
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+STATE_KEY = 'ops_admin:reference:state'
+TIMEOUT = 60 * 60 * 24
+
+
+def reference_state():
+
+    """
+    (version, last modified) of the retailer/supplier reference data. Bumped by invalidate_reference() from the
+    model signals, every cached response is keyed on the version so old entries just stop being read and age out.
+    """
+
+    state = cache.get(STATE_KEY)
+    if state is None:
+        cache.add(STATE_KEY, (uuid.uuid4().hex, int(time.time())), None)
+        state = cache.get(STATE_KEY)
+    return state
+
+
+def bump_reference():
+
+    cache.set(STATE_KEY, (uuid.uuid4().hex, int(time.time())), None)
+
+
+def invalidate_reference(**kwargs):
+
+    """Signal receiver. Bumps again on commit so a read cached mid-transaction doesn't outlive the change."""
+
+    bump_reference()
+    transaction.on_commit(bump_reference)
+
+
+def reference_cache(view):
+
+    """
+    Cache GET responses of a retailer/supplier view until the reference data next changes, with ETag and
+    Last-Modified headers so terminals re-polling get a 304 without the view (or the database) being touched.
+
+    Goes directly above the view function, under @api_view/@permission_classes so authentication still runs.
+    The serialized data is cached rather than the rendered response, so every format/renderer shares an entry,
+    but each renderer's output is its own representation with its own ETag, varying on Accept.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+        version, last_modified = reference_state()
+        digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = f'ops_admin:reference:{version}:{digest}'
+        etag = quote_etag(f'{version}-{digest}-{request.accepted_renderer.format}')
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            data = cache.get(key)
+            if data is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                cache.set(key, response.data, TIMEOUT)
+            else:
+                response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    return wrapper
@@ -0,0 +1,135 @@
+"""
+Response compression for the terminals on slow Wi-Fi: brotli when the client accepts it and the brotli package is
+installed, gzip otherwise.
+
+Bodies under min_size go out as they are, since below about a kilobyte the headers and CPU time cost more than the
+bytes saved. Streamed exports (?format=ndjson/csv) are compressed as they stream, whatever their size. Event streams
+and formats that are already compressed (images, PDFs, zips) are left alone.
+"""
+
+import asyncio
+import zlib
+
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (
+    'text/', 'application/json', 'application/x-ndjson', 'application/msgpack', 'application/javascript',
+    'application/xml',
+)
+NOT_COMPRESSIBLE = ('text/event-stream',)
+
+
+def accepted_encodings(header):
+
+    """{coding: q} from an Accept-Encoding header."""
+
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding.strip():
+            codings[coding.strip().lower()] = quality
+    return codings
+
+
+class CompressionMiddleware:
+
+    """
+    Goes just under MetricsMiddleware, so the metrics see the bytes sent and everything else sees the plain body.
+    Strong ETags are made weak on compressed responses, as Django's GZipMiddleware does. Sync and async capable
+    like MetricsMiddleware, so it doesn't put ASGI requests through the sync thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    min_size = 1024
+    gzip_level = 6
+    brotli_quality = 5
+
+    def __init__(self, get_response):
+
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        return self.process(request, self.get_response(request))
+
+    async def acall(self, request):
+
+        return self.process(request, await self.get_response(request))
+
+    def process(self, request, response):
+
+        content_type = response.get('Content-Type', '')
+        if response.has_header('Content-Encoding') or not content_type.startswith(COMPRESSIBLE) \
+                or content_type.startswith(NOT_COMPRESSIBLE):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = self.compress_stream(encoding, response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = self.compress(encoding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def encoding(self, header):
+
+        codings = accepted_encodings(header)
+        for encoding in ('br', 'gzip') if brotli is not None else ('gzip',):
+            if codings.get(encoding, codings.get('*', 0)) > 0:
+                return encoding
+        return None
+
+    def compressor(self, encoding):
+
+        """(compress(chunk), finish()) for one response."""
+
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return compressor.process, compressor.finish
+        # wbits 31: a deflate stream in a gzip container.
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return compressor.compress, compressor.flush
+
+    def compress(self, encoding, content):
+
+        compress, finish = self.compressor(encoding)
+        return compress(content) + finish()
+
+    def compress_stream(self, encoding, chunks):
+
+        compress, finish = self.compressor(encoding)
+        for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
@@ -0,0 +1,41 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from ops_admin.models import Retailer, Supplier, Concession
+from ops_admin.reconciliation import covers
+
+CHUNK = 300
+
+
+def active_concessions(queries):
+
+    """
+    For each {retailer, supplier, product, date} query (retailer/supplier by code), the ids of the concessions
+    active on that date. A null start or end date counts as open ended.
+
+    The whole batch costs two code lookups plus one query per CHUNK distinct (retailer, supplier, product) triples, each
+    triple an equality probe on concession_active_idx. The date check is then done in memory on the candidates.
+    """
+
+    retailers = dict(Retailer.objects.filter(code__in={q['retailer'] for q in queries}).values_list('code', 'pk'))
+    suppliers = dict(Supplier.objects.filter(code__in={q['supplier'] for q in queries}).values_list('code', 'pk'))
+    keys = [(retailers.get(q['retailer']), suppliers.get(q['supplier']), q['product']) for q in queries]
+    triples = list({key for key in keys if None not in key})
+    candidates = defaultdict(list)
+    for start in range(0, len(triples), CHUNK):
+        condition = reduce(or_, (
+            Q(retailer_id=retailer, supplier_id=supplier, product=product)
+            for retailer, supplier, product in triples[start:start + CHUNK]
+        ))
+        rows = Concession.objects.filter(condition).values_list(
+            'pk', 'retailer_id', 'supplier_id', 'product', 'start_date', 'end_date'
+        )
+        for pk, retailer, supplier, product, start_date, end_date in rows:
+            candidates[(retailer, supplier, product)].append((pk, start_date, end_date))
+    return [
+        [pk for pk, start_date, end_date in candidates.get(key, ()) if covers(start_date, end_date, query['date'])]
+        for key, query in zip(keys, queries)
+    ]
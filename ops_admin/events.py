@@ -0,0 +1,276 @@
+"""
+Server-sent change events for orders, concessions and memos, so terminals can stop polling the list endpoints.
+
+Writes call changed() (from the model signals, or directly for the bulk order writes that skip them) and the events
+go out once the transaction commits. BUS is an in-process bus: each event is serialized once and the same bytes
+are handed to every matching stream, an idle stream is a queue and a keepalive timer with no database work at all.
+Only streams in the process that made the write see it, so run the API as one webapi.asgi process, or give
+the ASGIHandler below a bus of the same shape that fans out through a broker.
+
+Event ids are "<bus epoch>-<sequence>". A reconnecting EventSource sends the last one back (Last-Event-ID) and gets
+what it missed from the recent history. If that isn't possible (a restart, too far behind, or events written while
+no stream was open and so never serialized) it gets a "reset" event instead and should reload through the list
+endpoints or /sync/. So does a stream that opened while such a write was still in its transaction, when it commits.
+"""
+
+import asyncio
+import threading
+import uuid
+from collections import deque, namedtuple
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.core.handlers import asgi
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from ops_admin.models import Order, Concession, Memo
+from ops_admin.serializers import OrderSerializer, ConcessionSerializer, MemoSerializer
+
+STREAMS = {
+    'orders': (Order, OrderSerializer),
+    'concessions': (Concession, ConcessionSerializer),
+    'memos': (Memo, MemoSerializer),
+}
+
+MODEL_STREAMS = {model: kind for kind, (model, serializer_class) in STREAMS.items()}
+
+HISTORY = 1000
+MAX_PENDING = 1000
+KEEPALIVE = 15
+RETRY_MS = 5000
+
+Event = namedtuple('Event', 'id kind retailer supplier frame')
+
+_receive = ContextVar('asgi_receive')
+
+
+def reset_frame(event_id):
+
+    return b'id: %s\nevent: reset\ndata: {}\n\n' % event_id.encode()
+
+
+def codes(instance):
+
+    """(retailer, supplier) codes to filter on. Orders store the codes, the notes point at the rows."""
+
+    if isinstance(instance, Order):
+        return instance.retailer, instance.supplier
+    return instance.retailer.code, instance.supplier.code
+
+
+class Subscription:
+
+    def __init__(self, kinds, retailer=None, supplier=None):
+
+        self.kinds = set(kinds)
+        self.retailer = retailer
+        self.supplier = supplier
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.overflowed = False
+
+    def wants(self, event):
+
+        return (
+            event.kind in self.kinds
+            and self.retailer in (None, event.retailer)
+            and self.supplier in (None, event.supplier)
+        )
+
+    def put(self, frames):
+
+        """On the event loop. A stream that can't keep up is ended, it resumes from its Last-Event-ID."""
+
+        if self.overflowed:
+            return
+        if self.queue.qsize() + len(frames) > MAX_PENDING:
+            self.overflowed = True
+            self.queue.put_nowait(None)
+            return
+        for frame in frames:
+            self.queue.put_nowait(frame)
+
+
+class EventBus:
+
+    def __init__(self, history=HISTORY):
+
+        self.lock = threading.Lock()
+        self.epoch = uuid.uuid4().hex[:8]
+        self.sequence = 0
+        self.history = deque(maxlen=history)
+        self.subscribers = set()
+
+    def publish(self, kind, rows):
+
+        """
+        rows are (retailer, supplier, data bytes) for each changed object, or None where nothing was listening when
+        it was written, which streams of that kind open now get a reset for. Safe to call from any thread, delivery
+        happens on each subscriber's event loop.
+        """
+
+        with self.lock:
+            events = []
+            for row in rows:
+                self.sequence += 1
+                if row is None:
+                    events.append(Event(self.sequence, kind, None, None, None))
+                    continue
+                retailer, supplier, data = row
+                frame = b'id: %s-%d\nevent: %s\ndata: %s\n\n' % (
+                    self.epoch.encode(), self.sequence, kind.encode(), data
+                )
+                events.append(Event(self.sequence, kind, retailer, supplier, frame))
+            self.history.extend(events)
+            subscribers = list(self.subscribers)
+            reset = reset_frame(f'{self.epoch}-{self.sequence}')
+        for subscription in subscribers:
+            if any(event.frame is None and event.kind in subscription.kinds for event in events):
+                # Written before this stream opened, so there's nothing to send it but a reset.
+                frames = [reset]
+            else:
+                frames = [event.frame for event in events if event.frame is not None and subscription.wants(event)]
+            if not frames:
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, frames)
+            except RuntimeError:
+                # The loop has closed under a stream that never got to unsubscribe.
+                self.unsubscribe(subscription)
+
+    def subscribe(self, subscription, last_event_id=None):
+
+        """
+        Register subscription and return the frames it missed since last_event_id, or None if they can't be replayed.
+        Done under the lock so nothing published meanwhile is both replayed and delivered, or neither.
+        """
+
+        with self.lock:
+            self.subscribers.add(subscription)
+            if last_event_id is None:
+                return []
+            epoch, _, sequence = last_event_id.rpartition('-')
+            if epoch != self.epoch or not sequence.isdigit() or int(sequence) > self.sequence:
+                return None
+            after = int(sequence)
+            if after < self.sequence and (not self.history or self.history[0].id > after + 1):
+                return None
+            missed = [event for event in self.history if event.id > after]
+        if any(event.frame is None for event in missed):
+            return None
+        return [event.frame for event in missed if subscription.wants(event)]
+
+    def unsubscribe(self, subscription):
+
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def last_event_id(self):
+
+        with self.lock:
+            return f'{self.epoch}-{self.sequence}'
+
+
+BUS = EventBus()
+
+
+def changed(kind, action, instances, bus=BUS):
+
+    """
+    Queue created/updated/deleted events for instances, published on commit and dropped on rollback. The data is
+    serialized now, with the rows as written, and only if some stream is open.
+    """
+
+    serializer_class = STREAMS[kind][1]
+    if bus.subscribers:
+        data = [None] * len(instances) if action == 'deleted' else serializer_class(instances, many=True).data
+        renderer = JSONRenderer()
+        rows = [
+            (*codes(instance), renderer.render({'action': action, 'id': instance.pk, 'data': item}))
+            for instance, item in zip(instances, data)
+        ]
+    else:
+        rows = [None] * len(instances)
+    transaction.on_commit(lambda: bus.publish(kind, rows))
+
+
+class EventStreamResponse(StreamingHttpResponse):
+
+    """
+    Returned by the events view. Has no body of its own, ASGIHandler spots it and streams from the bus until the
+    client goes away, where any other server would just send the headers.
+    """
+
+    def __init__(self, kinds, retailer=None, supplier=None, last_event_id=None, bus=BUS):
+
+        super().__init__((), content_type='text/event-stream; charset=utf-8')
+        self['Cache-Control'] = 'no-cache'
+        self['X-Accel-Buffering'] = 'no'
+        self.kinds = kinds
+        self.retailer = retailer
+        self.supplier = supplier
+        self.bus = bus
+        # Without a Last-Event-ID, start from now (the view) rather than from when the stream gets going.
+        self.last_event_id = last_event_id or bus.last_event_id()
+
+    async def events(self, receive):
+
+        subscription = Subscription(self.kinds, self.retailer, self.supplier)
+        missed = self.bus.subscribe(subscription, self.last_event_id)
+        disconnect = asyncio.ensure_future(receive())
+        try:
+            if missed is None:
+                missed = [reset_frame(self.bus.last_event_id())]
+            yield b'retry: %d\n\n' % RETRY_MS + b''.join(missed)
+            while True:
+                frame = asyncio.ensure_future(subscription.queue.get())
+                done, pending = await asyncio.wait(
+                    {frame, disconnect}, timeout=KEEPALIVE, return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnect in done:
+                    frame.cancel()
+                    return
+                if frame not in done:
+                    frame.cancel()
+                    yield b': keepalive\n\n'
+                    continue
+                frames = [frame.result()]
+                while not subscription.queue.empty():
+                    frames.append(subscription.queue.get_nowait())
+                if None in frames:
+                    yield b''.join(frames[:frames.index(None)])
+                    return
+                yield b''.join(frames)
+        finally:
+            self.bus.unsubscribe(subscription)
+            disconnect.cancel()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+
+    """Django's ASGI handler, plus streaming EventStreamResponses from the event loop (webapi.asgi serves this)."""
+
+    async def __call__(self, scope, receive, send):
+
+        token = _receive.set(receive)
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            _receive.reset(token)
+
+    async def send_response(self, response, send):
+
+        if not isinstance(response, EventStreamResponse):
+            return await super().send_response(response, send)
+        headers = [
+            (header.encode('ascii'), value.encode('latin1')) for header, value in response.items()
+        ] + [
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip()) for cookie in response.cookies.values()
+        ]
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        async for chunk in response.events(_receive.get()):
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
@@ -0,0 +1,180 @@
+from rest_framework import serializers
+
+from ops_admin.reconciliation import date_overlaps, day_bounds
+
+RANGES = ('gt', 'gte', 'lt', 'lte')
+
+
+class FilterSet(serializers.Serializer):
+
+    """
+    Declarative ?query parameter filters for a list view. Every field is an optional parameter, validated like any
+    serializer field (a bad value is a 400), and its source is the ORM lookup it becomes, so
+    recieved_after = DateTimeField(source='recieved__gte') reads WHERE recieved >= %s. A filter_<source>(queryset,
+    value) method takes over where one lookup isn't enough. Only indexed columns are filterable, ops_admin.tests
+    checks every combination of two against the query plan.
+
+    ?ordering=name,-name sorts on ordering_fields, which are indexed and not null so the cursor paginators can page
+    through them. The id is added as the tie-break. Without it, a range filter (?updated_after=, ?ends_before=)
+    sorts on its own column: SQLite has no statistics for ranges and would rather walk the primary key in id order
+    than search the column's index, and the column is usually the order wanted anyway. range_columns names the
+    column for filter_ methods that filter on a range.
+    """
+
+    ordering = serializers.CharField()
+
+    ordering_fields = ['id']
+    range_columns = {}
+
+    @classmethod
+    def from_request(cls, request):
+
+        """The validated filters from request.query_params, raising ValidationError (a 400 from a view) otherwise."""
+
+        filters = cls(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        return filters
+
+    def get_fields(self):
+
+        fields = super().get_fields()
+        for field in fields.values():
+            field.required = False
+        return fields
+
+    def validate_ordering(self, value):
+
+        ordering = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in ordering if name.lstrip('-') not in self.ordering_fields]
+        if unknown:
+            raise serializers.ValidationError(
+                [f'Can\'t order by {name}, use one of {", ".join(self.ordering_fields)}.' for name in unknown]
+            )
+        return ordering
+
+    def filter(self, queryset):
+
+        for lookup, value in self.validated_data.items():
+            if lookup == 'ordering':
+                continue
+            method = getattr(self, f'filter_{lookup}', None)
+            queryset = method(queryset, value) if method is not None else queryset.filter(**{lookup: value})
+        ordering = self.order_by()
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    def order_by(self):
+
+        """The requested ordering for the paginator, or None to keep its default."""
+
+        ordering = self.validated_data.get('ordering')
+        if not ordering:
+            column = self.range_column()
+            if column is None:
+                return None
+            ordering = [column]
+        if ordering[-1].lstrip('-') != 'id':
+            ordering = ordering + ['-id' if ordering[0].startswith('-') else 'id']
+        return tuple(ordering)
+
+    def range_column(self):
+
+        for lookup in self.validated_data:
+            if lookup in self.range_columns:
+                return self.range_columns[lookup]
+            column, _, comparison = lookup.rpartition('__')
+            if comparison in RANGES:
+                return column
+        return None
+
+
+class OrderFilter(FilterSet):
+
+    retailer = serializers.CharField(max_length=4)
+    supplier = serializers.CharField(max_length=4)
+    ordernum = serializers.CharField(max_length=20)
+    date = serializers.DateField()
+    recieved_after = serializers.DateTimeField(source='recieved__gte')
+    recieved_before = serializers.DateTimeField(source='recieved__lt')
+    updated_after = serializers.DateTimeField(source='updated_at__gte')
+
+    ordering_fields = ['recieved', 'updated_at', 'id']
+    range_columns = {'date': 'recieved'}
+
+    def filter_date(self, queryset, value):
+
+        start, end = day_bounds(value)
+        return queryset.filter(recieved__gte=start, recieved__lt=end)
+
+
+class RetailerFilter(FilterSet):
+
+    code = serializers.CharField(max_length=4)
+    supplier = serializers.CharField(max_length=4, source='list__code')
+    updated_after = serializers.DateTimeField(source='updated_at__gte')
+
+    ordering_fields = ['code', 'updated_at', 'id']
+
+
+class SupplierFilter(FilterSet):
+
+    code = serializers.CharField(max_length=4)
+    retailer = serializers.CharField(max_length=4, source='retailer__code')
+    updated_after = serializers.DateTimeField(source='updated_at__gte')
+
+    ordering_fields = ['code', 'updated_at', 'id']
+
+
+class NoteFilter(FilterSet):
+
+    """Concessions, memos and manual orders: retailer/supplier by code or id."""
+
+    retailer = serializers.CharField(max_length=4, source='retailer__code')
+    supplier = serializers.CharField(max_length=4, source='supplier__code')
+    retailer_id = serializers.IntegerField()
+    supplier_id = serializers.IntegerField()
+    updated_after = serializers.DateTimeField(source='updated_at__gte')
+
+    ordering_fields = ['updated_at', 'id']
+
+
+class ConcessionFilter(NoteFilter):
+
+    product = serializers.CharField(max_length=20)
+    active_on = serializers.DateField()
+    ends_after = serializers.DateField(source='end_date__gte')
+    ends_before = serializers.DateField(source='end_date__lte')
+    best_before_after = serializers.DateField(source='best_before__gte')
+    best_before_before = serializers.DateField(source='best_before__lte')
+
+    def validate(self, attrs):
+
+        """A null start or end date is open ended, which no index can range over, so narrow active_on by something else."""
+
+        if set(attrs) - {'ordering'} == {'active_on'}:
+            raise serializers.ValidationError({'active_on': ['Use with another filter, e.g. ?retailer=.']})
+        return attrs
+
+    def filter_active_on(self, queryset, value):
+
+        return queryset.filter(date_overlaps(value, value))
+
+
+class MemoFilter(NoteFilter):
+
+    active_on = serializers.DateField()
+    ends_after = serializers.DateField(source='end_date__gte')
+    ends_before = serializers.DateField(source='end_date__lte')
+
+    ordering_fields = ['start_date', 'end_date', 'updated_at', 'id']
+    range_columns = {'active_on': 'end_date'}
+
+    def filter_active_on(self, queryset, value):
+
+        return queryset.filter(start_date__lte=value, end_date__gte=value)
+
+
+class ManualOrderFilter(NoteFilter):
+
+    processing = serializers.DateField()
+    processing_after = serializers.DateField(source='processing__gte')
+    processing_before = serializers.DateField(source='processing__lte')
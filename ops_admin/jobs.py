@@ -0,0 +1,57 @@
+import traceback
+from collections import namedtuple
+
+from django.utils import timezone
+
+from ops_admin.models import Job
+
+Task = namedtuple('Task', ['func', 'staff_only', 'internal'])
+
+TASKS = {}
+
+
+def task(name, staff_only=False, internal=False):
+
+    """
+    Register a function as a job kind. Its keyword arguments come from Job.args and its return value (anything
+    DjangoJSONEncoder can handle) is stored as Job.result. internal jobs can't be enqueued through the API.
+    """
+
+    def register(func):
+        TASKS[name] = Task(func, staff_only, internal)
+        return func
+
+    return register
+
+
+def enqueue(kind, owner=None, **args):
+
+    return Job.objects.create(kind=kind, owner=owner, args=args)
+
+
+def claim():
+
+    """
+    Take the oldest queued job. SQLite has no SELECT ... FOR UPDATE SKIP LOCKED, so the claim is a conditional
+    UPDATE - whichever worker flips the status first gets the job, the rest move on to the next one.
+    """
+
+    while True:
+        pk = Job.objects.filter(status=Job.QUEUED).order_by('created_at', 'pk').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(status=Job.RUNNING, started_at=timezone.now()):
+            return Job.objects.get(pk=pk)
+
+
+def run(job):
+
+    try:
+        job.result = TASKS[job.kind].func(**job.args)
+        job.status = Job.DONE
+    except Exception:
+        job.error = traceback.format_exc()
+        job.status = Job.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'error', 'status', 'finished_at'])
+    return job
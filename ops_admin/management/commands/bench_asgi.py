@@ -0,0 +1,78 @@
+import asyncio
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.test.client import AsyncClient
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Compare many concurrent readers of the sync (WSGI, thread per request) and async (ASGI, /async/) read '
+        'endpoints. Both handlers are driven in process through the test clients, so the numbers leave out the '
+        'network and server but include everything Django and DRF do. Uses a throwaway admin user.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--paths', nargs='+', default=['orders/', 'retailers/', 'suppliers/', 'concessions/', 'memos/'])
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, paths, concurrency, requests, **options):
+
+        user = User.objects.create_superuser(f'bench-{uuid.uuid4().hex[:8]}', '', None)
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                client = Client()
+                client.force_login(user)
+                self.stdout.write(f'{"path":<16} {"handler":<8} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+                for path in paths:
+                    self.report(path, 'wsgi', *self.wsgi(client.cookies, f'/{path}', concurrency, requests))
+                    self.report(path, 'asgi', *asyncio.run(self.asgi(client.cookies, f'/async/{path}', concurrency, requests)))
+        finally:
+            user.delete()
+
+    def wsgi(self, cookies, path, concurrency, requests):
+
+        def get(_):
+            client = Client()
+            client.cookies = cookies
+            started = time.perf_counter()
+            assert client.get(path, HTTP_ACCEPT='application/json').status_code == 200, path
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(get, range(requests)))
+        return time.perf_counter() - started, samples
+
+    async def asgi(self, cookies, path, concurrency, requests):
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get():
+            async with semaphore:
+                client = AsyncClient()
+                client.cookies = cookies
+                started = time.perf_counter()
+                assert (await client.get(path)).status_code == 200, path
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(get() for _ in range(requests)))
+        return time.perf_counter() - started, samples
+
+    def report(self, path, handler, elapsed, samples):
+
+        samples = sorted(samples)
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        self.stdout.write(
+            f'{path:<16} {handler:<8} {len(samples) / elapsed:>8.1f} '
+            f'{statistics.median(samples) * 1000:>8.2f} {p99 * 1000:>8.2f}'
+        )
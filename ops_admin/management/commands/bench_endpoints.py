@@ -0,0 +1,251 @@
+import json
+import platform
+import re
+import statistics
+import subprocess
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from ops_admin import urls
+from ops_admin.models import Order, Retailer, Supplier, Concession, Memo, ManualOrder, Upload, Job
+
+Case = namedtuple('Case', 'name method path data write')
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def get(name, kwargs=None, query=''):
+
+    return Case(name, 'GET', reverse(name, kwargs=kwargs) + query, None, False)
+
+
+def write(name, method, data, kwargs=None):
+
+    return Case(name, method, reverse(name, kwargs=kwargs), data, True)
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Hit every endpoint in ops_admin/urls.py in-process and record throughput, latency percentiles, query counts '
+        'and response sizes as JSON, to compare runs with --baseline. Meant for a scratch database filled by '
+        'generate_wms_data. Writes run inside a transaction that is rolled back after each request. Query counts '
+        'come from the metrics middleware and miss the async views, which query from a worker thread.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--only', default='', help='Only endpoints whose url name contains this.')
+        parser.add_argument('--output', default=None, help='Write the results here as JSON.')
+        parser.add_argument('--baseline', default=None, help='An earlier --output to compare against.')
+
+    def handle(self, *args, requests, warmup, only, output, baseline, **options):
+
+        if not Order.objects.exists() or not Concession.objects.exists() or not Memo.objects.exists():
+            raise CommandError('No data to benchmark, run generate_wms_data first.')
+        setup_test_environment()
+        user = User.objects.create_superuser(f'bench-endpoints-{int(time.time())}', password=None)
+        try:
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            cases = [case for case in self.cases(user) if only in case.name]
+            self.uncovered(cases, only)
+            results = []
+            for case in cases:
+                self.stderr.write(f'{case.method} {case.path}', ending='\r')
+                results.append(self.run(client, case, requests, warmup))
+        finally:
+            user.delete()
+        report = {
+            'created': timezone.now().isoformat(),
+            'commit': self.commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'requests': requests,
+            'dataset': {model.__name__: model.objects.count() for model in (Order, Retailer, Supplier, Concession, Memo)},
+            'endpoints': results,
+        }
+        self.table(results, self.load(baseline))
+        if output:
+            with open(output, 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f'Wrote {output}')
+
+    def cases(self, user):
+
+        order = Order.objects.using('default').order_by('-pk').first()
+        retailer = Retailer.objects.order_by('pk').first()
+        supplier = retailer.list.first() or Supplier.objects.order_by('pk').first()
+        concession = Concession.objects.order_by('pk').first()
+        memo = Memo.objects.order_by('pk').first()
+        manual = ManualOrder.objects.order_by('pk').first() or ManualOrder.objects.create(
+            owner=user, retailer=retailer, supplier=supplier, details='Benchmark', attachments='bench.pdf'
+        )
+        upload = Upload.objects.create(owner=user, manual=manual, filename='bench.pdf', size=1024)
+        job = Job.objects.create(owner=user, kind='checklist', args={}, status=Job.DONE, result=[])
+        day = timezone.localtime(order.recieved).date().isoformat()
+        since = (timezone.now() - timedelta(hours=1)).isoformat()
+        recent = list(Order.objects.using('default').order_by('-pk').values_list('pk', flat=True)[:100])
+        rows = [{'recieved': order.recieved.isoformat(), 'retailer': retailer.code, 'supplier': supplier.code,
+                 'ordernum': f'BENCH{n}'} for n in range(100)]
+        queries = [{'retailer': retailer.code, 'supplier': supplier.code, 'product': concession.product, 'date': day}
+                   for _ in range(100)]
+        return [
+            Case('api-root', 'GET', '/', None, False),
+            get('user-list'),
+            get('user-detail', {'pk': user.pk}),
+            get('order-list'),
+            get('order-list', query='?page_size=1000'),
+            get('order-list', query='?fields=id,ordernum&page_size=1000'),
+            write('order-list', 'POST', rows[0]),
+            get('order-detail', {'pk': order.pk}),
+            write('order-detail', 'PUT', rows[0], {'pk': order.pk}),
+            write('order-detail', 'DELETE', None, {'pk': order.pk}),
+            write('order-bulk', 'POST', rows),
+            write('order-bulk', 'PATCH', [{'id': pk, 'ordernum': 'BENCH'} for pk in recent]),
+            write('order-bulk', 'DELETE', {'ids': recent}),
+            get('order-notes', query=f'?date={day}'),
+            get('order-summary', query=f'?date={day}'),
+            get('retailer-list'),
+            get('retailer-detail', {'pk': retailer.pk}),
+            get('retailer-code-detail', {'code': retailer.code}),
+            write('retailer-list', 'POST', {'code': 'ZZZZ', 'name': 'Benchmark', 'list': [supplier.pk]}),
+            get('supplier-list'),
+            get('supplier-detail', {'pk': supplier.pk}),
+            get('supplier-code-detail', {'code': supplier.code}),
+            get('concession-list'),
+            get('concession-list', query='?page_size=1000'),
+            get('concession-detail', {'pk': concession.pk}),
+            get('concession-active', query='?' + '&'.join(f'{key}={value}' for key, value in queries[0].items())),
+            write('concession-active', 'POST', queries),
+            get('memo-list'),
+            get('memo-list', query='?exclude=content&page_size=1000'),
+            get('memo-detail', {'pk': memo.pk}),
+            write('memo-list', 'POST', {'retailer': retailer.pk, 'supplier': supplier.pk, 'start_date': day,
+                                        'end_date': day, 'content': 'Benchmark'}),
+            get('manual-list'),
+            get('manual-detail', {'pk': manual.pk}),
+            write('upload-list', 'POST', {'manual': manual.pk, 'filename': 'bench.pdf', 'size': 1024}),
+            get('upload-detail', {'pk': upload.pk}),
+            get('checklist', query=f'?date={day}'),
+            get('sync', query=f'?since={since.replace("+", "%2B")}'),
+            get('job-list'),
+            write('job-list', 'POST', {'kind': 'checklist', 'args': {'date': day}}),
+            get('job-detail', {'pk': job.pk}),
+            get('metrics'),
+            get('search', query='?q=pallets'),
+            get('search', query='?q=short%20life&kinds=concessions&limit=100'),
+            get('async-order-list'),
+            get('async-order-detail', {'pk': order.pk}),
+            get('async-retailer-list'),
+            get('async-retailer-detail', {'pk': retailer.pk}),
+            get('async-supplier-list'),
+            get('async-supplier-detail', {'pk': supplier.pk}),
+            get('async-concession-list'),
+            get('async-concession-detail', {'pk': concession.pk}),
+            get('async-memo-list'),
+            get('async-memo-detail', {'pk': memo.pk}),
+        ]
+
+    def uncovered(self, cases, only):
+
+        names = {pattern.name for pattern in urls.urlpatterns if pattern.name and only in pattern.name}
+        missing = names - {case.name for case in cases}
+        if missing:
+            self.stderr.write(f'Not benchmarked: {", ".join(sorted(missing))}')
+
+    def request(self, client, case):
+
+        """One request, (seconds, response). Writes are rolled back so every iteration sees the same data."""
+
+        kwargs = {'HTTP_X_SERVER_TIMING': '1'}
+        if case.data is not None:
+            kwargs.update(data=json.dumps(case.data), content_type='application/json')
+        call = getattr(client, case.method.lower())
+        started = time.perf_counter()
+        if case.write:
+            with transaction.atomic():
+                response = call(case.path, **kwargs)
+                transaction.set_rollback(True)
+        else:
+            response = call(case.path, **kwargs)
+        return time.perf_counter() - started, response
+
+    def run(self, client, case, requests, warmup):
+
+        for _ in range(warmup):
+            self.request(client, case)
+        samples, queries, statuses, size = [], [], set(), 0
+        for _ in range(requests):
+            seconds, response = self.request(client, case)
+            samples.append(seconds)
+            statuses.add(response.status_code)
+            match = QUERIES.search(response.get('Server-Timing', ''))
+            if match:
+                queries.append(int(match[1]))
+            size = len(response.content)
+        cuts = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+        return {
+            'endpoint': case.name,
+            'method': case.method,
+            'path': case.path,
+            'status': sorted(statuses),
+            'requests': requests,
+            'rps': requests / sum(samples),
+            'latency_ms': {
+                'mean': statistics.mean(samples) * 1000,
+                'p50': cuts[49] * 1000,
+                'p90': cuts[89] * 1000,
+                'p99': cuts[98] * 1000,
+                'max': max(samples) * 1000,
+            },
+            'queries': {'median': statistics.median(queries), 'max': max(queries)} if queries else None,
+            'bytes': size,
+        }
+
+    def load(self, baseline):
+
+        if baseline is None:
+            return {}
+        with open(baseline) as handle:
+            return {(row['method'], row['path']): row for row in json.load(handle)['endpoints']}
+
+    def table(self, results, baseline):
+
+        key = lambda row: (row['method'], row['path'])
+        self.stdout.write(
+            f'{"endpoint":<48} {"status":>7} {"req/s":>8} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"queries":>7}'
+            + (f' {"p50 vs baseline":>16}' if baseline else '')
+        )
+        for row in results:
+            latency, queries = row['latency_ms'], row['queries']
+            line = (
+                f'{row["method"] + " " + row["path"][:41]:<48} {",".join(map(str, row["status"])):>7} '
+                f'{row["rps"]:>8.1f} {latency["p50"]:>8.2f} {latency["p90"]:>8.2f} {latency["p99"]:>8.2f} '
+                f'{queries["median"] if queries else "-":>7}'
+            )
+            if key(row) in baseline:
+                before = baseline[key(row)]['latency_ms']['p50']
+                line += f' {(latency["p50"] - before) / before * 100:>+15.1f}%'
+            self.stdout.write(line)
+
+    def commit(self):
+
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ops_admin.models import Order
+from ops_admin.reconciliation import day_bounds
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Time date-window Order queries as the order history grows. The daily volume stays fixed while more days '
+        'are added, so with the (retailer, supplier, recieved) index the query time should stay roughly flat. '
+        'Runs inside a transaction that is rolled back, nothing is left in the database.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 500000])
+        parser.add_argument('--per-day', type=int, default=2000)
+        parser.add_argument('--codes', type=int, default=30, help='Number of retailer and supplier codes.')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, per_day, codes, repeat, **options):
+
+        owner = User.objects.create(username='bench-order-window')
+        codes = [f'{n:04d}' for n in range(codes)]
+        today = timezone.localdate()
+        start, end = day_bounds(today)
+        rows = 0
+        self.stdout.write(f'{"orders":>10} {"day (ms)":>10} {"pair (ms)":>10}  plan')
+        for size in sorted(sizes):
+            rows += self.insert_orders(owner, codes, today, rows, size - rows, per_day)
+            day = Order.objects.filter(recieved__gte=start, recieved__lt=end).order_by('recieved')[:100]
+            pair = Order.objects.filter(retailer=codes[0], supplier=codes[1], recieved__gte=start, recieved__lt=end)
+            day_ms = self.time(lambda: list(day.values_list('id', flat=True)), repeat)
+            pair_ms = self.time(pair.count, repeat)
+            self.stdout.write(f'{rows:>10} {day_ms:>10.3f} {pair_ms:>10.3f}  {self.plan(pair)}')
+
+    def insert_orders(self, owner, codes, today, offset, count, per_day):
+
+        """Insert orders going backwards in time from today, per_day orders on each day.
+
+        Rows are written with executemany rather than bulk_create, building a model instance per row would cost more
+        than the INSERTs. updated_at is set to recieved, as if each order was last touched when it came in.
+        """
+
+        table = connection.ops.quote_name(Order._meta.db_table)
+        sql = (
+            f'INSERT INTO {table} (owner_id, recieved, updated_at, retailer, supplier, ordernum) '
+            f'VALUES (%s, %s, %s, %s, %s, %s)'
+        )
+        midday = day_bounds(today)[0] + timedelta(hours=12)
+        with connection.cursor() as cursor:
+            batch = []
+            for n in range(offset, offset + count):
+                recieved = midday - timedelta(days=n // per_day, seconds=random.randrange(43200))
+                recieved = connection.ops.adapt_datetimefield_value(recieved)
+                batch.append((owner.pk, recieved, recieved, random.choice(codes), random.choice(codes), str(n)))
+                if len(batch) == 10000:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            cursor.executemany(sql, batch)
+        return count
+
+    def time(self, query, repeat):
+
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples) * 1000
+
+    def plan(self, queryset):
+
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' | '.join(str(row[-1]) for row in cursor.fetchall())
@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from rest_framework.renderers import JSONRenderer
+
+from ops_admin.compression import CompressionMiddleware, brotli
+from ops_admin.management.commands import bench_serializers
+from ops_admin.models import Order, Supplier, Concession, Memo
+from ops_admin.renderers import MessagePackRenderer, msgpack
+from ops_admin.rows import fast_rows
+from ops_admin.serializers import OrderSerializer, SupplierSerializer, ConcessionSerializer, MemoSerializer
+
+
+class Command(bench_serializers.Command):
+
+    help = (
+        'Bytes on the wire and encode time for one list page as JSON (the default JSONRenderer) and as columnar '
+        'MessagePack, each plain, gzipped and brotli compressed at the CompressionMiddleware levels. Populates like '
+        'bench_serializers, inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def run(self, rows, page_size, repeat, **options):
+
+        if page_size > rows:
+            raise CommandError('--page-size is larger than --rows.')
+        owner = User.objects.create(username='bench-renderers')
+        self.populate(owner, rows)
+        renderers = [('json', JSONRenderer())]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+        else:
+            self.stdout.write('msgpack is not installed, JSON only.')
+        encodings = ['gzip'] + (['br'] if brotli is not None else [])
+        if brotli is None:
+            self.stdout.write('brotli is not installed, gzip only.')
+        compression = CompressionMiddleware(get_response=None)
+        suites = [
+            ('orders', Order, OrderSerializer),
+            ('suppliers', Supplier, SupplierSerializer),
+            ('concessions', Concession, ConcessionSerializer),
+            ('memos', Memo, MemoSerializer),
+        ]
+        header = f'{"model":<12} {"format":<8} {"bytes":>9} {"encode ms":>10}'
+        for encoding in encodings:
+            header += f' {encoding + " bytes":>11} {encoding + " ms":>9}'
+        self.stdout.write(header)
+        for name, model, serializer_class in suites:
+            queryset = serializer_class.setup_eager_loading(model.objects.filter(owner=owner).order_by('pk'))
+            values, row = fast_rows(queryset[:page_size], serializer_class)
+            page = {
+                'next': f'http://testserver/{name}/?cursor=cD0xMDAw&page_size={page_size}',
+                'previous': None,
+                'results': [row(item) for item in values],
+            }
+            for format, renderer in renderers:
+                body, encode_ms = self.time(lambda: renderer.render(page), repeat)
+                line = f'{name:<12} {format:<8} {len(body):>9} {encode_ms:>10.2f}'
+                for encoding in encodings:
+                    compressed, compress_ms = self.time(lambda: compression.compress(encoding, body), repeat)
+                    line += f' {len(compressed):>11} {compress_ms:>9.2f}'
+                self.stdout.write(line)
@@ -0,0 +1,123 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from ops_admin.management.commands.generate_wms_data import code
+from ops_admin.models import Order, Retailer, Supplier, Concession, Memo
+from ops_admin.rows import fast_rows
+from ops_admin.serializers import OrderSerializer, SupplierSerializer, ConcessionSerializer, MemoSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Rows/sec serializing list responses through the DRF serializers and through the .values() fast path '
+        '(ops_admin.rows), query and JSON rendering included. '
+        'Runs inside a transaction that is rolled back, nothing is left in the database.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+
+        try:
+            with transaction.atomic():
+                self.run(**options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, rows, repeat, **options):
+
+        owner = User.objects.create(username='bench-serializers')
+        self.populate(owner, rows)
+        suites = [
+            ('orders', Order, OrderSerializer),
+            ('suppliers', Supplier, SupplierSerializer),
+            ('concessions', Concession, ConcessionSerializer),
+            ('memos', Memo, MemoSerializer),
+        ]
+        self.stdout.write(f'{"model":<12} {"rows":>7} {"drf rows/s":>12} {"fast rows/s":>12} {"speedup":>8}')
+        for name, model, serializer_class in suites:
+            queryset = serializer_class.setup_eager_loading(model.objects.filter(owner=owner).order_by('pk'))
+            count = queryset.count()
+            _, slow_ms = self.time(lambda: self.drf(queryset, serializer_class), repeat)
+            _, fast_ms = self.time(lambda: self.fast(queryset, serializer_class), repeat)
+            slow_rate, fast_rate = count / slow_ms * 1000, count / fast_ms * 1000
+            self.stdout.write(
+                f'{name:<12} {count:>7} {slow_rate:>12.0f} {fast_rate:>12.0f} {fast_rate / slow_rate:>7.1f}x'
+            )
+
+    def populate(self, owner, rows):
+
+        codes = [f'{n:04d}' for n in range(30)]
+        today = timezone.localdate()
+        # Codes are unique across owners, keep clear of the R/S codes generate_wms_data hands out.
+        Retailer.objects.bulk_create(Retailer(owner=owner, code=code('X', n), name=f'Retailer {n}') for n in range(30))
+        Supplier.objects.bulk_create(
+            Supplier(owner=owner, code=code('Y', n), name=f'Supplier {n}') for n in range(max(rows // 10, 30))
+        )
+        # SQLite doesn't hand back primary keys from bulk_create, so read the rows back for the foreign keys.
+        retailers = list(Retailer.objects.filter(owner=owner))
+        suppliers = list(Supplier.objects.filter(owner=owner))
+        Order.objects.bulk_create(
+            (Order(owner=owner, retailer=random.choice(codes), supplier=random.choice(codes), ordernum=str(n))
+             for n in range(rows)),
+            batch_size=1000,
+        )
+        Concession.objects.bulk_create(
+            (Concession(
+                owner=owner,
+                retailer=random.choice(retailers),
+                supplier=random.choice(suppliers),
+                product=f'P{n}',
+                description='Short dated, 20% off',
+                best_before=today + timedelta(days=n % 20) if n % 3 else None,
+                start_date=today - timedelta(days=n % 10),
+                end_date=today + timedelta(days=n % 30) if n % 4 else None,
+            ) for n in range(rows)),
+            batch_size=1000,
+        )
+        Memo.objects.bulk_create(
+            (Memo(
+                owner=owner,
+                retailer=random.choice(retailers),
+                supplier=random.choice(suppliers),
+                start_date=today,
+                end_date=today + timedelta(days=7),
+                content='Deliveries to the back entrance. ' * 4,
+            ) for n in range(rows)),
+            batch_size=1000,
+        )
+
+    def drf(self, queryset, serializer_class):
+
+        return JSONRenderer().render(serializer_class(queryset.all(), many=True).data)
+
+    def fast(self, queryset, serializer_class):
+
+        values, row = fast_rows(queryset.all(), serializer_class)
+        return JSONRenderer().render([row(item) for item in values])
+
+    def time(self, func, repeat):
+
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            samples.append(time.perf_counter() - started)
+        return result, statistics.median(samples) * 1000
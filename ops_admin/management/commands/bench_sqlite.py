@@ -0,0 +1,101 @@
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from ops_admin.models import Order
+from ops_admin.writes import run_serialized
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Concurrent read/write throughput on a scratch SQLite file, with the stock sqlite3 settings (rollback '
+        'journal, deferred transactions, no retries) and with the DATABASES default profile plus ops_admin.writes. '
+        'Writers do a read-then-write transaction like the views do.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help='Writes per writer thread.')
+
+    def handle(self, *args, writers, readers, writes, **options):
+
+        directory = Path(tempfile.mkdtemp(prefix='bench-sqlite-'))
+        profiles = {
+            'bench_stock': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': directory / 'stock.sqlite3'},
+            'bench_tuned': {**settings.DATABASES['default'], 'NAME': directory / 'tuned.sqlite3'},
+        }
+        try:
+            self.stdout.write(f'{"profile":<12} {"writes/s":>9} {"reads/s":>9} {"failed writes":>14}')
+            for alias, database in profiles.items():
+                connections.databases[alias] = database
+                call_command('migrate', database=alias, verbosity=0)
+                owner = User.objects.db_manager(alias).create(username='bench-sqlite')
+                self.run(alias, owner.pk, writers, readers, writes, tuned=alias == 'bench_tuned')
+                connections[alias].close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run(self, alias, owner, writers, readers, writes, tuned):
+
+        done = threading.Event()
+        counts = {'writes': 0, 'reads': 0, 'failed': 0}
+        count_lock = threading.Lock()
+
+        def add(key):
+            with count_lock:
+                counts[key] += 1
+
+        def write():
+            with transaction.atomic(using=alias):
+                latest = Order.objects.using(alias).order_by('-pk').values_list('pk', flat=True).first() or 0
+                Order.objects.using(alias).create(
+                    owner_id=owner, retailer='R001', supplier='S001', ordernum=str(latest + 1)
+                )
+
+        def writer():
+            try:
+                for _ in range(writes):
+                    try:
+                        run_serialized(write, using=alias) if tuned else write()
+                        add('writes')
+                    except OperationalError:
+                        add('failed')
+            finally:
+                connections[alias].close()
+
+        def reader():
+            try:
+                while not done.is_set():
+                    Order.objects.using(alias).filter(retailer='R001', supplier='S001').count()
+                    add('reads')
+                    time.sleep(random.uniform(0, 0.001))
+            finally:
+                connections[alias].close()
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        background = [threading.Thread(target=reader) for _ in range(readers)]
+        started = time.perf_counter()
+        for thread in threads + background:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        for thread in background:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        name = 'tuned' if tuned else 'stock'
+        self.stdout.write(
+            f'{name:<12} {counts["writes"] / elapsed:>9.1f} {counts["reads"] / elapsed:>9.1f} {counts["failed"]:>14}'
+        )
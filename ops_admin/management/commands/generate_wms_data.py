@@ -0,0 +1,162 @@
+import random
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ops_admin.cache import bump_reference
+from ops_admin import search
+from ops_admin.models import Order, Retailer, Supplier, Concession, Memo
+from ops_admin.summary import rebuild
+
+ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def code(prefix, n):
+
+    """4 char retailer/supplier codes, the prefix plus n in base 36 - room for 46656 of each."""
+
+    digits = ''
+    for _ in range(3):
+        n, digit = divmod(n, 36)
+        digits = ALPHABET[digit] + digits
+    return prefix + digits
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Fill the database with a synthetic WMS dataset for load testing: retailers, suppliers with checklists, '
+        'orders spread over a date range (mostly for checklist pairs, some missing each day), concessions and memos. '
+        'The same options and --seed give the same data. Everything is owned by the --owner user, run it against a '
+        'scratch database.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--retailers', type=int, default=50)
+        parser.add_argument('--suppliers', type=int, default=200)
+        parser.add_argument('--checklist', type=int, default=20, help='Suppliers on each retailer checklist.')
+        parser.add_argument('--orders', type=int, default=1000000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None, help='Last order day, default today.')
+        parser.add_argument('--concessions', type=int, default=20000)
+        parser.add_argument('--memos', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--owner', default='synthetic')
+
+    def handle(self, *args, retailers, suppliers, checklist, orders, days, end_date, concessions, memos, seed, owner,
+               **options):
+
+        if retailers > 36 ** 3 or suppliers > 36 ** 3:
+            raise CommandError('At most 46656 retailers and suppliers.')
+        if User.objects.filter(username=owner).exists():
+            raise CommandError(f'User {owner} already exists, generate into a fresh database or pick another --owner.')
+        self.random = random.Random(seed)
+        end_date = end_date or timezone.localdate()
+        first_day = end_date - timedelta(days=days - 1)
+        with transaction.atomic():
+            owner = User.objects.create(username=owner)
+            retailer_rows, supplier_rows, pairs = self.reference(owner, retailers, suppliers, checklist)
+            self.stdout.write(f'{len(retailer_rows)} retailers, {len(supplier_rows)} suppliers, {len(pairs)} checklist pairs')
+            self.orders(owner, retailer_rows, supplier_rows, pairs, orders, first_day, days)
+            self.stdout.write(f'{orders} orders from {first_day} to {end_date}')
+            self.concessions(owner, pairs, concessions, first_day, end_date)
+            self.memos(owner, pairs, memos, first_day, end_date)
+            self.stdout.write(f'{concessions} concessions, {memos} memos')
+            self.stdout.write(f'{rebuild()} order summary rows')
+            # bulk_create skips the signals that would index the notes for search, as it does these below.
+            self.stdout.write(f'{search.rebuild()} notes indexed for search')
+        # bulk_create skips the signals that would normally expire the cached reference data.
+        bump_reference()
+
+    def reference(self, owner, retailers, suppliers, checklist):
+
+        Retailer.objects.bulk_create(
+            Retailer(owner=owner, code=code('R', n), name=f'Retailer {n}') for n in range(retailers)
+        )
+        Supplier.objects.bulk_create(
+            Supplier(owner=owner, code=code('S', n), name=f'Supplier {n}') for n in range(suppliers)
+        )
+        # SQLite doesn't hand back primary keys from bulk_create, so read the rows back for the foreign keys.
+        retailer_rows = list(Retailer.objects.filter(owner=owner).order_by('pk'))
+        supplier_rows = list(Supplier.objects.filter(owner=owner).order_by('pk'))
+        through = Retailer.list.through
+        pairs = [
+            (retailer, supplier)
+            for retailer in retailer_rows
+            for supplier in self.random.sample(supplier_rows, min(checklist, len(supplier_rows)))
+        ]
+        through.objects.bulk_create(
+            (through(retailer_id=retailer.pk, supplier_id=supplier.pk) for retailer, supplier in pairs),
+            batch_size=1000,
+        )
+        return retailer_rows, supplier_rows, pairs
+
+    def orders(self, owner, retailer_rows, supplier_rows, pairs, count, first_day, days):
+
+        """
+        Nine in ten orders are for a checklist pair, the rest for any retailer/supplier. Written with executemany
+        rather than bulk_create, building a model instance per row would cost more than the INSERTs.
+        """
+
+        table = connection.ops.quote_name(Order._meta.db_table)
+        sql = (
+            f'INSERT INTO {table} (owner_id, recieved, updated_at, retailer, supplier, ordernum) '
+            f'VALUES (%s, %s, %s, %s, %s, %s)'
+        )
+        midnight = timezone.make_aware(datetime.combine(first_day, time.min))
+        batch = []
+        with connection.cursor() as cursor:
+            for n in range(count):
+                if self.random.random() < 0.9:
+                    retailer, supplier = self.random.choice(pairs)
+                else:
+                    retailer, supplier = self.random.choice(retailer_rows), self.random.choice(supplier_rows)
+                recieved = midnight + timedelta(days=n * days // count, seconds=self.random.randrange(86400))
+                recieved = connection.ops.adapt_datetimefield_value(recieved)
+                batch.append((owner.pk, recieved, recieved, retailer.code, supplier.code, f'{n:010d}'))
+                if len(batch) == 10000:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            cursor.executemany(sql, batch)
+
+    def concessions(self, owner, pairs, count, first_day, end_date):
+
+        span = (end_date - first_day).days + 1
+        rows = []
+        for n in range(count):
+            retailer, supplier = self.random.choice(pairs)
+            start_date = first_day + timedelta(days=self.random.randrange(span))
+            open_ended = self.random.random() < 0.2
+            rows.append(Concession(
+                owner=owner,
+                retailer_id=retailer.pk,
+                supplier_id=supplier.pk,
+                product=f'P{self.random.randrange(100000):06d}',
+                description=self.random.choice(['Short life accepted', 'Out of spec BBE', 'Label variance']),
+                best_before=start_date + timedelta(days=self.random.randrange(3, 30)),
+                start_date=start_date,
+                end_date=None if open_ended else start_date + timedelta(days=self.random.randrange(1, 60)),
+            ))
+        Concession.objects.bulk_create(rows, batch_size=1000)
+
+    def memos(self, owner, pairs, count, first_day, end_date):
+
+        span = (end_date - first_day).days + 1
+        rows = []
+        for n in range(count):
+            retailer, supplier = self.random.choice(pairs)
+            start_date = first_day + timedelta(days=self.random.randrange(span))
+            rows.append(Memo(
+                owner=owner,
+                retailer_id=retailer.pk,
+                supplier_id=supplier.pk,
+                start_date=start_date,
+                end_date=start_date + timedelta(days=self.random.randrange(1, 14)),
+                content=' '.join(self.random.choice(['Deliver', 'to', 'bay', 'before', '6am', 'pallets', 'only'])
+                                 for _ in range(self.random.randrange(10, 200))),
+            ))
+        Memo.objects.bulk_create(rows, batch_size=1000)
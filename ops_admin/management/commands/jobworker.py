@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from ops_admin.jobs import claim, run
+from ops_admin.models import Job
+
+
+class Command(BaseCommand):
+
+    help = (
+        'Run queued ops_admin jobs on a pool of worker threads. Jobs left running by a worker that died are put '
+        'back on the queue at start up, so only run one jobworker per database.'
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+
+    def handle(self, *args, workers, poll, once, **options):
+
+        requeued = Job.objects.filter(status=Job.RUNNING).update(status=Job.QUEUED, started_at=None)
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} interrupted job(s).')
+        self.stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobworker') as pool:
+            futures = [pool.submit(self.work, poll, once) for _ in range(workers)]
+            try:
+                for future in futures:
+                    future.result()
+            except KeyboardInterrupt:
+                self.stop.set()
+                self.stdout.write('Stopping once running jobs finish.')
+
+    def work(self, poll, once):
+
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                job = claim()
+                if job is None:
+                    if once:
+                        return
+                    self.stop.wait(poll)
+                    continue
+                job = run(job)
+                self.stdout.write(f'{job} in {(job.finished_at - job.started_at).total_seconds():.2f}s')
+        finally:
+            connection.close()
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ops_admin.summary import rebuild
+
+
+class Command(BaseCommand):
+
+    help = 'Recompute the daily order summary table from the Order rows.'
+
+    def handle(self, *args, **options):
+
+        self.stdout.write(f'Rebuilt order summary, {rebuild()} retailer/supplier/day rows.')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ops_admin.search import rebuild
+
+
+class Command(BaseCommand):
+
+    help = 'Refill the full text search index from the memo, concession and manual order rows.'
+
+    def handle(self, *args, **options):
+
+        self.stdout.write(f'Rebuilt search index, {rebuild()} notes.')
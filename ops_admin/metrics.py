@@ -0,0 +1,266 @@
+"""
+In-process request metrics: MetricsMiddleware records latency, DB queries and time, serialization time and response
+size for every request, per route pattern, and metrics() renders them in the Prometheus text format for /metrics.
+
+Memory is bounded: series are keyed by the URL pattern (orders/<int:pk>/, not the path), histograms are fixed bucket
+counts rather than samples, past MAX_SERIES routes everything else is counted under route="other", and methods
+outside METHODS (anything a client cares to send) under method="other". Each worker process keeps its own numbers,
+scrape every process (or run one) to see them all.
+"""
+
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+PREFIX = 'ops_admin'
+MAX_SERIES = 500
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+SERVER_TIMING_HEADER = 'HTTP_X_SERVER_TIMING'
+
+HISTOGRAMS = {
+    'request_duration_seconds': (
+        'Request latency by route.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'db_queries': (
+        'Database queries per request by route.',
+        (0, 1, 2, 5, 10, 25, 50, 100, 250),
+    ),
+    'response_bytes': (
+        'Response body size by route, streamed responses excluded.',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+}
+
+COUNTERS = {
+    'requests_total': 'Requests by route and status code.',
+    'db_seconds_total': 'Time spent in database queries by route.',
+    'serialize_seconds_total': 'Time spent serializing and rendering response bodies by route.',
+}
+
+_current = ContextVar('request_stats', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+
+    """
+    Installed on every connection, counts the query against the request in the current context, if any. The stats
+    travel in a contextvar, which sync_to_async copies into its worker threads, so the queries of views run in
+    other threads (the async views, sync views under ASGI) are counted too.
+    """
+
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def instrument(connection, **kwargs):
+
+    """connection_created receiver, also called for connections opened before this module was imported."""
+
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+connection_created.connect(instrument)
+
+
+class RequestStats:
+
+    """Per-request accumulator, and what count_queries() counts and times the request's queries with."""
+
+    def __init__(self):
+
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+
+class Registry:
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+
+        with self.lock:
+            self.histograms = {name: {} for name in HISTOGRAMS}
+            self.counters = {name: {} for name in COUNTERS}
+            self.routes = set()
+
+    def route(self, route):
+
+        if route not in self.routes and len(self.routes) >= MAX_SERIES:
+            return 'other'
+        self.routes.add(route)
+        return route
+
+    def observe(self, name, labels, value):
+
+        buckets = HISTOGRAMS[name][1]
+        series = self.histograms[name].get(labels)
+        if series is None:
+            series = self.histograms[name][labels] = [[0] * (len(buckets) + 1), 0.0]
+        series[0][bisect_left(buckets, value)] += 1
+        series[1] += value
+
+    def inc(self, name, labels, value=1):
+
+        self.counters[name][labels] = self.counters[name].get(labels, 0) + value
+
+    def record(self, method, route, status, stats, duration, size):
+
+        with self.lock:
+            labels = (('method', method if method in METHODS else 'other'), ('route', self.route(route)))
+            self.inc('requests_total', labels + (('status', str(status)),))
+            self.inc('db_seconds_total', labels, stats.db)
+            self.inc('serialize_seconds_total', labels, stats.serialize)
+            self.observe('request_duration_seconds', labels, duration)
+            self.observe('db_queries', labels, stats.queries)
+            if size is not None:
+                self.observe('response_bytes', labels, size)
+
+    def render(self):
+
+        """The Prometheus text exposition format, version 0.0.4."""
+
+        lines = []
+        with self.lock:
+            for name, (help_text, buckets) in HISTOGRAMS.items():
+                lines += [f'# HELP {PREFIX}_{name} {help_text}', f'# TYPE {PREFIX}_{name} histogram']
+                for labels, (counts, total) in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip((*buckets, '+Inf'), counts):
+                        cumulative += count
+                        lines.append(f'{PREFIX}_{name}_bucket{label_set(labels + (("le", str(bound)),))} {cumulative}')
+                    lines.append(f'{PREFIX}_{name}_sum{label_set(labels)} {total}')
+                    lines.append(f'{PREFIX}_{name}_count{label_set(labels)} {cumulative}')
+            for name, help_text in COUNTERS.items():
+                lines += [f'# HELP {PREFIX}_{name} {help_text}', f'# TYPE {PREFIX}_{name} counter']
+                for labels, value in sorted(self.counters[name].items()):
+                    lines.append(f'{PREFIX}_{name}{label_set(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def label_set(labels):
+
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+@contextmanager
+def serializing():
+
+    """Count the enclosed block as serialization time for the current request, a no-op outside of one."""
+
+    stats = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.serialize += time.perf_counter() - started
+
+
+def server_timing(stats, duration):
+
+    return ', '.join([
+        f'db;dur={stats.db * 1000:.1f};desc="{stats.queries} queries"',
+        f'serialize;dur={stats.serialize * 1000:.1f}',
+        f'total;dur={duration * 1000:.1f}',
+    ])
+
+
+class MetricsMiddleware:
+
+    """
+    Goes first in MIDDLEWARE so the latency covers the whole stack. Send "X-Server-Timing: 1" to get this request's
+    numbers back in a Server-Timing header. Streamed responses are recorded when the view returns, so the queries
+    and bytes of the stream itself aren't included.
+
+    Sync and async capable, under webapi.asgi it stays on the event loop rather than costing every request (the
+    async views included) a hop to the sync thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # What Django's MiddlewareMixin does, so the handler awaits this middleware.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        for connection in connections.all():
+            instrument(connection)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, stats)
+
+    async def acall(self, request):
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, stats)
+
+    def record(self, request, response, stats):
+
+        duration = time.perf_counter() - stats.started
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else '<unmatched>'
+        size = None if response.streaming else len(response.content)
+        REGISTRY.record(request.method, route, response.status_code, stats, duration, size)
+        if request.META.get(SERVER_TIMING_HEADER) == '1':
+            response['Server-Timing'] = server_timing(stats, duration)
+        return response
+
+    def process_template_response(self, request, response):
+
+        """DRF responses are rendered after the view returns, time it as serialization once it's done."""
+
+        stats = _current.get()
+        if stats is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                stats.serialize += time.perf_counter() - started
+
+            response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,88 @@
+# Generated by Django 3.1.14 on 2026-10-18 04:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Supplier',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=4)),
+                ('name', models.CharField(max_length=100)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suppliers', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Retailer',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=4)),
+                ('name', models.CharField(max_length=100)),
+                ('list', models.ManyToManyField(to='ops_admin.Supplier')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='retailers', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recieved', models.DateTimeField(auto_now_add=True)),
+                ('supplier', models.CharField(max_length=4)),
+                ('retailer', models.CharField(max_length=4)),
+                ('ordernum', models.CharField(max_length=20)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['recieved'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Memo',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('content', models.TextField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memos', to=settings.AUTH_USER_MODEL)),
+                ('retailer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ops_admin.retailer')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ops_admin.supplier')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ManualOrder',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('processing', models.DateField(null=True)),
+                ('details', models.TextField(max_length=500)),
+                ('attachments', models.FileField(upload_to='')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='manuals', to=settings.AUTH_USER_MODEL)),
+                ('retailer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ops_admin.retailer')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ops_admin.supplier')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Concession',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.CharField(max_length=20)),
+                ('description', models.CharField(max_length=100)),
+                ('best_before', models.DateField(null=True)),
+                ('start_date', models.DateField(null=True)),
+                ('end_date', models.DateField(null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='concessions', to=settings.AUTH_USER_MODEL)),
+                ('retailer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ops_admin.retailer')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='ops_admin.supplier')),
+            ],
+        ),
+    ]
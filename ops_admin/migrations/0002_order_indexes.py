@@ -0,0 +1,32 @@
+# Generated by Django 3.1.14 on 2026-10-18 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ops_admin', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='recieved',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='retailer',
+            name='code',
+            field=models.CharField(max_length=4, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='supplier',
+            name='code',
+            field=models.CharField(max_length=4, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['retailer', 'supplier', 'recieved'], name='order_checklist_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 04:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ops_admin', '0003_sync'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='concession',
+            index=models.Index(fields=['retailer', 'supplier', 'product', 'start_date', 'end_date'], name='concession_active_idx'),
+        ),
+    ]
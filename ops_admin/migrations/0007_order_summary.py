@@ -0,0 +1,47 @@
+# Generated by Django 3.1.14 on 2026-10-18 04:55
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def summarise_existing_orders(apps, schema_editor):
+
+    Order = apps.get_model('ops_admin', 'Order')
+    OrderSummary = apps.get_model('ops_admin', 'OrderSummary')
+    rows = (
+        Order.objects.using(schema_editor.connection.alias)
+        .annotate(day=TruncDate('recieved'))
+        .order_by()
+        .values_list('retailer', 'supplier', 'day')
+        .annotate(count=Count('id'))
+    )
+    OrderSummary.objects.using(schema_editor.connection.alias).bulk_create(
+        [OrderSummary(retailer=retailer, supplier=supplier, day=day, count=count) for retailer, supplier, day, count in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ops_admin', '0006_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('retailer', models.CharField(max_length=4)),
+                ('supplier', models.CharField(max_length=4)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ordersummary',
+            constraint=models.UniqueConstraint(fields=('day', 'retailer', 'supplier'), name='order_summary_unique'),
+        ),
+        migrations.RunPython(summarise_existing_orders, migrations.RunPython.noop),
+    ]
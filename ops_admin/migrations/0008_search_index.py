@@ -0,0 +1,41 @@
+from django.db import migrations
+
+SOURCES = [
+    ('memos', 1, 'ops_admin_memo', "''", 'content'),
+    ('concessions', 2, 'ops_admin_concession', 'product', 'description'),
+    ('manual orders', 3, 'ops_admin_manualorder', "''", 'details'),
+]
+
+
+def create_search_index(apps, schema_editor):
+
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE ops_admin_search USING fts5('
+        'kind UNINDEXED, object_id UNINDEXED, retailer_id UNINDEXED, supplier_id UNINDEXED, title, body, '
+        "tokenize = 'porter unicode61')"
+    )
+    for kind, number, table, title, body in SOURCES:
+        schema_editor.execute(
+            'INSERT INTO ops_admin_search (rowid, kind, object_id, retailer_id, supplier_id, title, body) '
+            f'SELECT id * 4 + %s, %s, id, retailer_id, supplier_id, {title}, {body} FROM {table}',
+            [number, kind],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS ops_admin_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ops_admin', '0007_order_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.1.14 on 2026-10-18 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ops_admin', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='concession',
+            index=models.Index(fields=['product'], name='concession_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='concession',
+            index=models.Index(fields=['start_date'], name='concession_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='concession',
+            index=models.Index(fields=['end_date'], name='concession_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='concession',
+            index=models.Index(fields=['best_before'], name='concession_best_before_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='manualorder',
+            index=models.Index(fields=['processing'], name='manual_processing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memo',
+            index=models.Index(fields=['start_date'], name='memo_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memo',
+            index=models.Index(fields=['end_date'], name='memo_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['supplier', 'recieved'], name='order_supplier_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['ordernum'], name='order_ordernum_idx'),
+        ),
+    ]
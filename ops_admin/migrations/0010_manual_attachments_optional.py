@@ -0,0 +1,18 @@
+# Generated by Django 3.1.14 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ops_admin', '0009_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='manualorder',
+            name='attachments',
+            field=models.FileField(blank=True, upload_to=''),
+        ),
+    ]
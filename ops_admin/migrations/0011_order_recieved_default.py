@@ -0,0 +1,19 @@
+# Generated by Django 3.1.14 on 2026-10-18 06:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ops_admin', '0010_manual_attachments_optional'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='recieved',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,4 +1,8 @@
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 class Order(models.Model):
 
@@ -13,10 +17,12 @@ class Order(models.Model):
     Probably would have been much clearer if I'd used a second database for testing...but it served its purpose of demonstrating what I was going for overall.
     """
 
-    recieved = models.DateTimeField(auto_now_add=True)
+    # The WMS feed sends when each order came in, auto_now_add would overwrite it (bulk loads included).
+    recieved = models.DateTimeField(default=timezone.now, db_index=True)
     supplier = models.CharField(max_length=4)
     retailer = models.CharField(max_length=4)
     ordernum = models.CharField(max_length=20)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
 
@@ -25,6 +31,34 @@ class Order(models.Model):
     class Meta:
 
         ordering = ['recieved']
+        indexes = [
+            models.Index(fields=['retailer', 'supplier', 'recieved'], name='order_checklist_idx'),
+            models.Index(fields=['supplier', 'recieved'], name='order_supplier_idx'),
+            models.Index(fields=['ordernum'], name='order_ordernum_idx'),
+        ]
+
+class OrderSummary(models.Model):
+
+    """
+    Orders per (retailer, supplier, day), kept up to date by ops_admin.summary as orders are saved, bulk loaded and
+    deleted - so dashboards read one row per pair instead of counting Order rows. `manage.py rebuild_order_summary`
+    recomputes it from scratch.
+    """
+
+    retailer = models.CharField(max_length=4)
+    supplier = models.CharField(max_length=4)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+
+        return f'{self.day} - {self.retailer} - {self.supplier}: {self.count}'
+
+    class Meta:
+
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'retailer', 'supplier'], name='order_summary_unique'),
+        ]
 
 class Retailer(models.Model):
 
@@ -41,9 +75,10 @@ class Retailer(models.Model):
     Seemed silly.
     """
 
-    code = models.CharField(max_length=4)
+    code = models.CharField(max_length=4, unique=True)
     name = models.CharField(max_length=100)
     list = models.ManyToManyField('Supplier')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
 
@@ -53,8 +88,9 @@ class Supplier(models.Model):
 
     owner = models.ForeignKey('auth.User', related_name='suppliers', on_delete=models.CASCADE)
 
-    code = models.CharField(max_length=4)
+    code = models.CharField(max_length=4, unique=True)
     name = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
     
@@ -85,11 +121,22 @@ class Concession(models.Model):
     best_before = models.DateField(null=True)
     start_date = models.DateField(null=True)
     end_date = models.DateField(null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
 
         return f'RETAILER: {self.retailer} SUPPLIER: {self.supplier} PRODUCT: {self.product}'
 
+    class Meta:
+
+        indexes = [
+            models.Index(fields=['retailer', 'supplier', 'product', 'start_date', 'end_date'], name='concession_active_idx'),
+            models.Index(fields=['product'], name='concession_product_idx'),
+            models.Index(fields=['start_date'], name='concession_start_idx'),
+            models.Index(fields=['end_date'], name='concession_end_idx'),
+            models.Index(fields=['best_before'], name='concession_best_before_idx'),
+        ]
+
 class Memo(models.Model):
 
     owner = models.ForeignKey('auth.User', related_name='memos', on_delete=models.CASCADE)
@@ -101,11 +148,19 @@ class Memo(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     content = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
 
         return f'RETAILER: {self.retailer} SUPPLIER: {self.supplier}  START: {self.start_date}, END: {self.end_date} - ({len(self.content)} characters)'
 
+    class Meta:
+
+        indexes = [
+            models.Index(fields=['start_date'], name='memo_start_idx'),
+            models.Index(fields=['end_date'], name='memo_end_idx'),
+        ]
+
 class ManualOrder(models.Model):
 
     owner = models.ForeignKey('auth.User', related_name='manuals', on_delete=models.CASCADE)
@@ -117,8 +172,109 @@ class ManualOrder(models.Model):
     supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE)
     processing = models.DateField(null=True)
     details = models.TextField(max_length=500)
-    attachments = models.FileField()
+    attachments = models.FileField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
 
         return f'RETAILER: {self.retailer} SUPPLIER: {self.supplier} PROCESSING: {self.processing} FILES: {self.attachments}'
+
+    class Meta:
+
+        indexes = [
+            models.Index(fields=['processing'], name='manual_processing_idx'),
+        ]
+
+class Attachment(models.Model):
+
+    """
+    Content addressed store for manual order files - the same scan emailed in three times is only kept once.
+    text/thumbnail are filled in after upload by the process_attachment job, off the request path.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to='attachments/')
+    size = models.BigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True)
+    text = models.TextField(blank=True)
+    thumbnail = models.FileField(upload_to='thumbnails/', blank=True)
+    processed = models.BooleanField(default=False)
+
+    def __str__(self):
+
+        return f'{self.file.name} ({self.size} bytes)'
+
+class Upload(models.Model):
+
+    """ A resumable, chunked upload in progress - chunks are appended to a partial file until offset reaches size """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey('auth.User', related_name='uploads', on_delete=models.CASCADE)
+    manual = models.ForeignKey(ManualOrder, null=True, blank=True, related_name='uploads', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    attachment = models.ForeignKey(Attachment, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def complete(self):
+
+        return self.offset >= self.size
+
+    def __str__(self):
+
+        return f'{self.filename} {self.offset}/{self.size}'
+
+class Job(models.Model):
+
+    """
+    Queue for work too slow for the request/response cycle (exports, reconciliation, attachment processing).
+    Enqueued by ops_admin.jobs.enqueue, picked up by `manage.py jobworker` - it's just a table, so no broker needed.
+    """
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    owner = models.ForeignKey('auth.User', null=True, blank=True, related_name='jobs', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=50)
+    args = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    result = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+    class Meta:
+
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_queue_idx'),
+        ]
+
+class Tombstone(models.Model):
+
+    """ Left behind when a row is deleted, so /sync/ clients know to drop their copy """
+
+    model = models.CharField(max_length=100)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+
+        return f'{self.model} {self.object_id} deleted {self.deleted_at}'
+
+    class Meta:
+
+        indexes = [
+            models.Index(fields=['model', 'deleted_at'], name='tombstone_sync_idx'),
+        ]
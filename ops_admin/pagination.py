@@ -0,0 +1,51 @@
+from rest_framework.pagination import CursorPagination
+
+from ops_admin.metrics import serializing
+from ops_admin.rows import fast_rows
+from ops_admin.serializers import sparse_fields
+
+
+class IdCursorPagination(CursorPagination):
+
+    """
+    Keyset pagination - each page is a `WHERE id > last_seen ORDER BY id LIMIT n` range scan on the primary key,
+    so a page deep into the table costs the same as the first one (unlike OFFSET, which has to walk every skipped row).
+    """
+
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class RecievedCursorPagination(IdCursorPagination):
+
+    """Orders page through the indexed recieved column, matching Order.Meta.ordering."""
+
+    ordering = 'recieved'
+
+
+def paginated(request, queryset, serializer_class, pagination_class=IdCursorPagination, ordering=None):
+
+    """
+    Serialize one keyset page of queryset for the sync and async list views, @api_view functions don't get
+    DEFAULT_PAGINATION_CLASS applied. Honours ?fields= / ?exclude=, narrow the queryset to match with
+    setup_eager_loading(queryset, **sparse_fields(request)). Pages are read with .values() and the precompiled row
+    function when the serializer allows it (see ops_admin.rows). ordering (a filter set's order_by()) replaces the
+    paginator's own.
+    """
+
+    fields = sparse_fields(request)
+    paginator = pagination_class()
+    if ordering:
+        paginator.ordering = ordering
+    fast = fast_rows(queryset, serializer_class, **fields, extra=[name.lstrip('-') for name in ordering or ()])
+    if fast is not None:
+        values, row = fast
+        page = paginator.paginate_queryset(values, request)
+        with serializing():
+            data = [row(values) for values in page]
+        return paginator.get_paginated_response(data)
+    page = paginator.paginate_queryset(queryset, request)
+    with serializing():
+        data = serializer_class(page, many=True, **fields).data
+    return paginator.get_paginated_response(data)
@@ -0,0 +1,91 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from ops_admin.models import Order, Retailer, Supplier, Concession, Memo
+from ops_admin.routers import order_db
+
+
+def day_bounds(day):
+
+    """Return the [start, end) datetimes covering a calendar day in the current timezone.
+
+    Filtering on a range rather than `recieved__date` keeps the lookup on the (retailer, supplier, recieved) index.
+    """
+
+    start = timezone.make_aware(datetime.combine(day, time.min))
+
+    return start, start + timedelta(days=1)
+
+
+def missing_pairs(day):
+
+    """Return the checklist (retailer, supplier) pairs that have no order recieved on the given day.
+
+    The expected set is the Retailer.list through table and the recieved set is Order, joined on the 4 char codes.
+    The difference is worked out by the database in a single NOT EXISTS query, so the cost depends on the size of
+    the checklists rather than the number of orders for the day. It runs on the orders replica when there is one.
+    """
+
+    start, end = day_bounds(day)
+    recieved = Order.objects.filter(
+        retailer=OuterRef('retailer__code'),
+        supplier=OuterRef('supplier__code'),
+        recieved__gte=start,
+        recieved__lt=end,
+    )
+
+    return (
+        Retailer.list.through.objects.using(order_db())
+        .annotate(recieved=Exists(recieved))
+        .filter(recieved=False)
+        .order_by('retailer__code', 'supplier__code')
+        .values('retailer__code', 'retailer__name', 'supplier__code', 'supplier__name')
+    )
+
+
+def date_overlaps(first, last):
+
+    """Q for rows whose start_date/end_date range touches [first, last], a null end counting as open ended."""
+
+    return (Q(start_date__lte=last) | Q(start_date__isnull=True)) & (Q(end_date__gte=first) | Q(end_date__isnull=True))
+
+
+def covers(start_date, end_date, day):
+
+    return (start_date is None or start_date <= day) and (end_date is None or end_date >= day)
+
+
+def applicable_notes(orders):
+
+    """
+    Attach the concessions and memos that apply to each order (same retailer and supplier, recieved between
+    start_date and end_date) as order['concessions'] / order['memos'] id lists.
+
+    orders are dicts with id, retailer, supplier and recieved. Rather than a query per order, every concession and
+    memo for the retailer/supplier pairs and date span involved is loaded in one query per model, grouped by pair
+    and sorted by start date, and each order only scans the candidates for its own pair.
+    """
+
+    if not orders:
+        return orders
+    days = [timezone.localtime(order['recieved']).date() for order in orders]
+    first, last = min(days), max(days)
+    retailers = dict(Retailer.objects.filter(code__in={o['retailer'] for o in orders}).values_list('code', 'pk'))
+    suppliers = dict(Supplier.objects.filter(code__in={o['supplier'] for o in orders}).values_list('code', 'pk'))
+    pairs = [(retailers.get(order['retailer']), suppliers.get(order['supplier'])) for order in orders]
+    for name, model in (('concessions', Concession), ('memos', Memo)):
+        index = defaultdict(list)
+        rows = (
+            model.objects
+            .filter(date_overlaps(first, last), retailer_id__in=retailers.values(), supplier_id__in=suppliers.values())
+            .order_by('start_date', 'pk')
+            .values_list('pk', 'retailer_id', 'supplier_id', 'start_date', 'end_date')
+        )
+        for pk, retailer, supplier, start_date, end_date in rows:
+            index[(retailer, supplier)].append((pk, start_date, end_date))
+        for order, pair, day in zip(orders, pairs, days):
+            order[name] = [pk for pk, start_date, end_date in index.get(pair, ()) if covers(start_date, end_date, day)]
+    return orders
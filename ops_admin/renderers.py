@@ -0,0 +1,176 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from ops_admin.rows import fast_rows
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class StreamingRenderer(ABC, BaseRenderer):
+
+    """
+    Export formats for the list views. stream() writes the queryset out one row at a time while walking it with
+    .iterator(), so memory stays flat and the first bytes go out straight away however big the table is.
+    render() covers plain Response data (single objects, error bodies) in the same format. Subclasses implement
+    lines(), the formatted text for the field names and rows.
+    """
+
+    charset = 'utf-8'
+    chunk_size = 2000
+
+    def rows(self, data):
+
+        return data if isinstance(data, list) else [data]
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+
+        if data is None:
+            return b''
+        rows = self.rows(data)
+        # Row error lists ({} for the rows that were fine) only have keys on some rows.
+        fields = list(dict.fromkeys(name for row in rows for name in row))
+        return ''.join(self.lines(fields, rows)).encode(self.charset)
+
+    def serialized(self, queryset, serializer_class, **kwargs):
+
+        """The serializer's field names and a generator of its rows, pulled from the database chunk_size at a time."""
+
+        serializer = serializer_class(**kwargs)
+        fields = list(serializer.fields.keys())
+        fast = fast_rows(queryset, serializer_class, **kwargs)
+        if fast is not None:
+            values, row = fast
+            return fields, (row(obj) for obj in values.iterator(chunk_size=self.chunk_size))
+        rows = (serializer.to_representation(obj) for obj in queryset.iterator(chunk_size=self.chunk_size))
+        return fields, rows
+
+    def stream(self, queryset, serializer_class, filename, **kwargs):
+
+        fields, rows = self.serialized(queryset, serializer_class, **kwargs)
+        response = StreamingHttpResponse(self.lines(fields, rows), content_type=f'{self.media_type}; charset={self.charset}')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{self.format}"'
+        return response
+
+    @abstractmethod
+    def lines(self, fields, rows):
+
+        pass
+
+
+class NDJSONRenderer(StreamingRenderer):
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def lines(self, fields, rows):
+
+        for row in rows:
+            yield json.dumps(row, cls=JSONEncoder) + '\n'
+
+
+class Echo:
+
+    """csv.writer target that hands each formatted line straight back instead of buffering it."""
+
+    def write(self, value):
+
+        return value
+
+
+class CSVRenderer(StreamingRenderer):
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def rows(self, data):
+
+        """Nested values, such as a field's list of validation errors, as JSON cells rather than Python reprs."""
+
+        return [
+            {key: json.dumps(value, cls=JSONEncoder) if isinstance(value, (list, dict)) else value
+             for key, value in row.items()}
+            for row in super().rows(data)
+        ]
+
+    def lines(self, fields, rows):
+
+        writer = csv.DictWriter(Echo(), fieldnames=fields, extrasaction='ignore')
+        yield writer.writerow(dict(zip(fields, fields)))
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class PrometheusRenderer(BaseRenderer):
+
+    """
+    /metrics, the view returns the exposition text ready made. Anything else (error bodies) goes out as JSON.
+    No version parameter here as DRF would then only match Accept headers that ask for it, the view sets it.
+    """
+
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return json.dumps(data, cls=JSONEncoder).encode(self.charset)
+
+
+class EventStreamRenderer(BaseRenderer):
+
+    """
+    Lets /events/ be negotiated for EventSource's "Accept: text/event-stream". The stream itself is an
+    EventStreamResponse that bypasses rendering, this only formats error bodies, as an "error" event.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+
+        return b'event: error\ndata: %s\n\n' % json.dumps(data, cls=JSONEncoder).encode(self.charset)
+
+
+def columns(rows):
+
+    """A list of dicts as {'fields': names, 'rows': [values in that order, ...]}, absent keys as None."""
+
+    fields = list(dict.fromkeys(name for row in rows for name in row))
+    return {'fields': fields, 'rows': [[row.get(name) for name in fields] for row in rows]}
+
+
+class MessagePackRenderer(BaseRenderer):
+
+    """
+    Compact binary responses for the terminals, negotiated with "Accept: application/msgpack" (or ?format=msgpack).
+    Lists and paginated pages go out columnar, the field names once and each row as an array, so a page is
+    {'next', 'previous', 'fields': [...], 'rows': [[...], ...]}. Anything else (single objects, error bodies) is
+    packed as is. Only offered when the msgpack package is installed, see REST_FRAMEWORK in settings.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+
+        if data is None:
+            return b''
+        if isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = {**{key: value for key, value in data.items() if key != 'results'}, **columns(data['results'])}
+        elif isinstance(data, list) and all(isinstance(row, dict) for row in data):
+            data = columns(data)
+        return msgpack.packb(data, default=self.encoder.default, use_bin_type=True)
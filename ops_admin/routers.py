@@ -0,0 +1,48 @@
+from django.conf import settings
+
+REPLICA = 'orders_replica'
+
+
+def order_db():
+
+    """The alias Order reads (and whole-query reconciliation against Order) should use."""
+
+    return REPLICA if REPLICA in settings.DATABASES else 'default'
+
+
+class OrderReplicaRouter:
+
+    """
+    Send Order reads to the read only 'orders_replica' database when one is configured - a copy of the whole
+    default database kept up to date from outside Django (litestream, a periodic .backup, the WMS export job...).
+    Big order scans then never queue up behind concession/memo writes on the primary. Every write, and every
+    ops-owned model, stays on default. Instances read from the replica save back to default as usual. Any other
+    database (the benchmarks' scratch ones) is left to Django's default routing.
+    """
+
+    def db_for_read(self, model, **hints):
+
+        if model._meta.label == 'ops_admin.Order':
+            return order_db()
+        return None
+
+    def db_for_write(self, model, **hints):
+
+        """Orders read from the replica are written back to default. Anything else is left to Django's default."""
+
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == REPLICA:
+            return 'default'
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+
+        """Rows of the default database and its replica can point at each other, other databases aren't ours."""
+
+        if {obj1._state.db, obj2._state.db} <= {'default', REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+
+        return db != REPLICA
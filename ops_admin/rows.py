@@ -0,0 +1,107 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+# Fields whose to_representation() returns what .values() already gives back, so the value is used as is.
+PASSTHROUGH = (serializers.ReadOnlyField, serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+# Fields whose to_representation() works on the raw column value as well as on the model attribute.
+CONVERTED = (
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DecimalField,
+    serializers.FloatField,
+    serializers.UUIDField,
+    serializers.ChoiceField,
+    serializers.JSONField,
+)
+
+
+def plan(model, field):
+
+    """The .values() lookup and converter (None to pass the value through) for one serializer field, or None."""
+
+    try:
+        column = model._meta.get_field(field.source.split('.')[0])
+    except FieldDoesNotExist:
+        return None
+    if not column.concrete or column.many_to_many:
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return (field.source, None) if field.pk_field is None and column.many_to_one else None
+    if not isinstance(field, PASSTHROUGH + CONVERTED):
+        return None
+    convert = None if isinstance(field, PASSTHROUGH) else field.to_representation
+    if '.' not in field.source:
+        return field.source, convert
+    if not column.many_to_one or (column.null and field.default is not None):
+        # DRF renders a missing related object as the field default or leaves the key out, .values() gives None.
+        return None
+    return field.source.replace('.', '__'), convert
+
+
+@lru_cache(maxsize=None)
+def field_names(serializer_class):
+
+    return frozenset(serializer_class().fields)
+
+
+def normalise(names, known):
+
+    """fields=/exclude= names as a cache key: known names only, each once, sorted (output follows the serializer)."""
+
+    return None if names is None else tuple(sorted(known.intersection(names)))
+
+
+# Keyed on normalise()d names, so the entries are bounded by the field combinations clients actually ask for;
+# the maxsize caps what a client walking through every combination can pin in memory.
+@lru_cache(maxsize=256)
+def compile_rows(serializer_class, model, fields=None, exclude=None):
+
+    """
+    Precompile serializer_class's output for rows read with .values(): returns (lookups, row) where
+    row(values) builds the same dict the serializer's to_representation() would from the model instance.
+    Returns None if any field can't be read straight from a column (M2M, methods, nested serializers, files).
+    """
+
+    serializer = serializer_class(fields=fields, exclude=exclude)
+    steps = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        step = plan(model, field)
+        if step is None:
+            return None
+        steps.append((name, *step))
+    opts = model._meta
+    lookups = [lookup for name, lookup, convert in steps]
+    lookups += [name for name in (opts.pk.name, *(name.lstrip('-') for name in opts.ordering)) if name not in lookups]
+
+    def row(values):
+
+        data = {}
+        for name, lookup, convert in steps:
+            value = values[lookup]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    return lookups, row
+
+
+def fast_rows(queryset, serializer_class, fields=None, exclude=None, extra=()):
+
+    """
+    The fast read-only path for list responses: queryset as .values() dicts plus the row function to serialize
+    them with, or None to fall back to serializer_class. The dicts keep the pk and model ordering for the paginators,
+    and the extra columns (a requested ordering).
+    """
+
+    known = field_names(serializer_class)
+    compiled = compile_rows(serializer_class, queryset.model, normalise(fields, known), normalise(exclude, known))
+    if compiled is None:
+        return None
+    lookups, row = compiled
+    lookups = lookups + [name for name in extra if name not in lookups]
+    return queryset.prefetch_related(None).values(*lookups), row
@@ -0,0 +1,137 @@
+"""
+Full text search over memo content, concession product/description and manual order details.
+
+The index is an SQLite FTS5 table (created by migration 0008) with one row per note, rowid = object id * 4 + kind
+number so a note's row can be replaced or dropped without a lookup. The model signals keep it current inside the
+same transaction as the write, rebuild() (manage.py rebuild_search_index) refills it from the tables.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from ops_admin.models import Concession, Memo, ManualOrder
+
+TABLE = 'ops_admin_search'
+
+# kind: (number, model, title column, body column)
+KINDS = {
+    'memos': (1, Memo, None, 'content'),
+    'concessions': (2, Concession, 'product', 'description'),
+    'manual orders': (3, ManualOrder, None, 'details'),
+}
+
+MODEL_KINDS = {model: kind for kind, (number, model, title, body) in KINDS.items()}
+
+TERMS = re.compile(r'\w+')
+
+
+def rowid(kind, pk):
+
+    return pk * 4 + KINDS[kind][0]
+
+
+def connection():
+
+    return connections['default']
+
+
+def index(kind, instance):
+
+    number, model, title, body = KINDS[kind]
+    with connection().cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid(kind, instance.pk)])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, kind, object_id, retailer_id, supplier_id, title, body) '
+            f'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+            [
+                rowid(kind, instance.pk),
+                kind,
+                instance.pk,
+                instance.retailer_id,
+                instance.supplier_id,
+                getattr(instance, title) if title else '',
+                getattr(instance, body),
+            ],
+        )
+
+
+def unindex(kind, pk):
+
+    with connection().cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid(kind, pk)])
+
+
+def rebuild():
+
+    """Refill the index from the memo, concession and manual order tables in one INSERT ... SELECT per kind."""
+
+    with connection().cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for kind, (number, model, title, body) in KINDS.items():
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, kind, object_id, retailer_id, supplier_id, title, body) '
+                f'SELECT id * 4 + %s, %s, id, retailer_id, supplier_id, {title or "%s"}, {body} '
+                f'FROM {model._meta.db_table}',
+                [number, kind] + ([] if title else ['']),
+            )
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_query(text):
+
+    """Every word of the search text as a prefix term, so 'short dat' finds 'short dated' and user input can't
+    break the FTS5 query syntax. None if there are no words."""
+
+    terms = TERMS.findall(text or '')
+    return ' '.join(f'"{term}"*' for term in terms) or None
+
+
+def matching(queryset, kind, text):
+
+    """queryset narrowed to the objects whose indexed text matches, however many there are (the admin's search)."""
+
+    query = match_query(text)
+    if query is None:
+        return queryset
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s', [query, kind])
+    )
+
+
+def search(text, kinds=None, retailer_id=None, supplier_id=None, limit=20):
+
+    """
+    Best matches first by bm25 (product matches weighted over descriptions) as dicts of kind, id, retailer_id,
+    supplier_id, snippet and score. Matched words are wrapped in ** in the snippet.
+    """
+
+    query = match_query(text)
+    if query is None:
+        return []
+    sql = (
+        f"SELECT kind, object_id, retailer_id, supplier_id, snippet({TABLE}, -1, '**', '**', '…', 16), "
+        f"bm25({TABLE}, 0, 0, 0, 0, 2.0, 1.0) AS score FROM {TABLE} WHERE {TABLE} MATCH %s"
+    )
+    params = [query]
+    if kinds:
+        sql += f' AND kind IN ({", ".join(["%s"] * len(kinds))})'
+        params += list(kinds)
+    if retailer_id is not None:
+        sql += ' AND retailer_id = %s'
+        params.append(retailer_id)
+    if supplier_id is not None:
+        sql += ' AND supplier_id = %s'
+        params.append(supplier_id)
+    sql += ' ORDER BY score LIMIT %s'
+    params.append(limit)
+    with connection().cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            {'kind': kind, 'id': pk, 'retailer_id': retailer, 'supplier_id': supplier, 'snippet': snippet,
+             'score': -score}
+            for kind, pk, retailer, supplier, snippet, score in cursor.fetchall()
+        ]
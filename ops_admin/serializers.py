@@ -1,15 +1,153 @@
 from rest_framework import serializers
-from ops_admin.models import Order, Retailer, Supplier, Concession, Memo, ManualOrder
+from ops_admin.models import Order, Retailer, Supplier, Concession, Memo, ManualOrder, Upload, Job
+from ops_admin.jobs import TASKS
+from ops_admin.summary import add_orders, apply, order_deltas
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, router
+from django.db.models import Max, Prefetch
+from django.utils import timezone
 
-class UserSerializer(serializers.ModelSerializer):
+def sparse_fields(request):
+
+    """?fields=a,b and/or ?exclude=c as the fields=/exclude= kwargs the serializers below take."""
+
+    params = request.query_params
+    return {key: [name for name in params[key].split(',') if name] for key in ('fields', 'exclude') if key in params}
+
+class SparseFieldsMixin:
+
+    """
+    Serializer(..., fields=[...], exclude=[...]) renders only the chosen fields, unknown names are a 400.
+    Read views pass sparse_fields(request) so API clients can skip large columns they don't use.
+    """
+
+    def __init__(self, *args, fields=None, exclude=None, **kwargs):
+
+        super().__init__(*args, **kwargs)
+        if fields is None and exclude is None:
+            return
+        unknown = (set(fields or ()) | set(exclude or ())) - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': [f'Unknown field {name}.' for name in sorted(unknown)]})
+        for name in list(self.fields):
+            if (fields is not None and name not in fields) or (exclude is not None and name in exclude):
+                self.fields.pop(name)
+
+class EagerLoadingMixin(SparseFieldsMixin):
+
+    """
+    Views pass their querysets through setup_eager_loading so related rows (owner.username, M2M and reverse
+    relations) are fetched in a fixed number of queries for the whole page rather than one or more per row.
+
+    Given fields/exclude it also narrows the queryset with .only() to the columns the remaining fields read (plus
+    the pk and the model's ordering, which the cursor paginators need), and skips joins and prefetches for
+    dropped relations, so e.g. ?exclude=content never reads Memo.content from the database.
+    """
+
+    select_related = ['owner']
+    prefetch_related = []
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, exclude=None):
+
+        select_related, prefetch_related = cls.select_related, cls.prefetch_related
+        if fields is not None or exclude is not None:
+            opts = queryset.model._meta
+            sources = [field.source for field in cls(fields=fields, exclude=exclude).fields.values()]
+            roots = {source.split('.')[0] for source in sources}
+            columns = {opts.pk.name, *(name.lstrip('-') for name in opts.ordering)}
+            for source in sources:
+                try:
+                    field = opts.get_field(source.split('.')[0])
+                except FieldDoesNotExist:
+                    continue
+                if field.concrete and not field.many_to_many:
+                    columns.update({field.name, source.replace('.', '__')})
+            select_related = [name for name in select_related if name.split('__')[0] in roots]
+            prefetch_related = [
+                lookup for lookup in prefetch_related
+                if getattr(lookup, 'prefetch_through', lookup).split('__')[0] in roots
+            ]
+            queryset = queryset.only(*columns)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        return queryset.prefetch_related(*prefetch_related)
+
+class UserSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     orders = serializers.PrimaryKeyRelatedField(many=True, queryset=Order.objects.all())
 
+    select_related = []
+    # Each relation renders as a list of ids, so only those (and owner, to match them up) are loaded.
+    prefetch_related = [
+        Prefetch(name, queryset=model.objects.only('id', 'owner'))
+        for name, model in [('orders', Order), ('retailers', Retailer), ('suppliers', Supplier),
+                            ('concessions', Concession), ('memos', Memo), ('manuals', ManualOrder)]
+    ]
+
     class Meta:
         model = User
         fields = ['id', 'username', 'orders', 'retailers', 'suppliers', 'concessions', 'memos', 'manuals']
 
-class OrderSerializer(serializers.Serializer):
+class OrderListSerializer(serializers.ListSerializer):
+
+    """
+    Bulk writes for the WMS feed. Rows are validated individually by OrderSerializer, then written in chunks with
+    bulk_create/bulk_update instead of one INSERT/UPDATE per order. Callers wrap save() in a write transaction
+    (ops_admin.writes).
+    Neither fires model signals, so the daily order summary is updated here in one pass for the whole batch.
+
+    For updates, instance is a dict of the target orders keyed by id and each row must carry its 'id'.
+    """
+
+    batch_size = 1000
+
+    def run_child_validation(self, data):
+
+        if self.instance is not None:
+            pk = data.get('id') if isinstance(data, dict) else None
+            self.child.instance = self.instance.get(pk) if isinstance(pk, int) else None
+            if self.child.instance is None:
+                raise serializers.ValidationError({'id': ['No order with this id.']})
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+
+        orders = Order.objects.db_manager(router.db_for_write(Order))
+        last = None
+        if not connections[orders.db].features.can_return_rows_from_bulk_insert:
+            last = orders.aggregate(last=Max('pk'))['last'] or 0
+        created = orders.bulk_create([Order(**attrs) for attrs in validated_data], batch_size=self.batch_size)
+        if last is not None:
+            # SQLite doesn't hand back the new ids. The transaction holds the write lock (BEGIN IMMEDIATE, see
+            # webapi.db), so the rows past the highest id from before are these, inserted in order.
+            pks = orders.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)
+            for order, pk in zip(created, pks):
+                order.pk = pk
+        add_orders(created)
+        return created
+
+    def update(self, instance, validated_data):
+
+        orders = []
+        now = timezone.now()
+        # Netted into one pass, an order whose retailer/supplier/day didn't change costs no summary query at all.
+        deltas = order_deltas(instance.values(), sign=-1)
+        for row, attrs in zip(self.initial_data, validated_data):
+            order = instance[row['id']]
+            for field in ('supplier', 'retailer', 'ordernum'):
+                setattr(order, field, attrs.get(field, getattr(order, field)))
+            order.updated_at = now
+            orders.append(order)
+        fields = ['supplier', 'retailer', 'ordernum', 'updated_at']
+        # bulk_update() runs on the read alias (Django 3.1), which for orders may be the read only replica.
+        Order.objects.using(router.db_for_write(Order)).bulk_update(orders, fields, batch_size=self.batch_size)
+        # update() keeps zero and negative counts, where + would drop them.
+        deltas.update(order_deltas(instance.values()))
+        apply(deltas)
+        return orders
+
+class OrderSerializer(EagerLoadingMixin, serializers.Serializer):
 
     id = serializers.IntegerField(read_only=True)
     owner = serializers.ReadOnlyField(source='owner.username')
@@ -35,16 +173,22 @@ class OrderSerializer(serializers.Serializer):
 
         return instance
 
-class RetailerSerializer(serializers.ModelSerializer):
+    class Meta:
+
+        list_serializer_class = OrderListSerializer
+
+class RetailerSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 
     owner = serializers.ReadOnlyField(source='owner.username')
 
+    prefetch_related = ['list']
+
     class Meta:
 
         model = Retailer
         fields = ['owner','code', 'name', 'list']
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 
     owner = serializers.ReadOnlyField(source='owner.username')    
     
@@ -53,7 +197,7 @@ class SupplierSerializer(serializers.ModelSerializer):
         model = Supplier
         fields = ['owner','code', 'name']
 
-class ConcessionSerializer(serializers.ModelSerializer):
+class ConcessionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 
     owner = serializers.ReadOnlyField(source='owner.username')
 
@@ -71,7 +215,7 @@ class ConcessionSerializer(serializers.ModelSerializer):
             'end_date'
             ]
 
-class MemoSerializer(serializers.ModelSerializer):
+class MemoSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 
     owner = serializers.ReadOnlyField(source='owner.username')
 
@@ -80,7 +224,7 @@ class MemoSerializer(serializers.ModelSerializer):
         model = Memo
         fields = ['owner','retailer', 'supplier', 'start_date', 'end_date', 'content']
 
-class ManualOrderSerializer(serializers.ModelSerializer):
+class ManualOrderSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 
     owner = serializers.ReadOnlyField(source='owner.username')
 
@@ -89,3 +233,52 @@ class ManualOrderSerializer(serializers.ModelSerializer):
         model = ManualOrder
         fields = ['owner','retailer', 'supplier', 'processing', 'details', 'attachments']
 
+class UploadSerializer(serializers.ModelSerializer):
+
+    complete = serializers.ReadOnlyField()
+    attachment = serializers.ReadOnlyField(source='attachment.file.name', default=None)
+
+    class Meta:
+
+        model = Upload
+        fields = ['id', 'manual', 'filename', 'content_type', 'size', 'offset', 'complete', 'attachment']
+        read_only_fields = ['offset']
+
+    def validate_size(self, value):
+
+        if value < 1:
+            raise serializers.ValidationError('Size must be at least 1 byte.')
+        return value
+
+class JobSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+
+    owner = serializers.ReadOnlyField(source='owner.username', default=None)
+
+    class Meta:
+
+        model = Job
+        fields = ['id', 'owner', 'kind', 'args', 'status', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = ['status', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def validate_kind(self, value):
+
+        if value not in TASKS or TASKS[value].internal:
+            raise serializers.ValidationError(f'Unknown job kind {value}.')
+        if TASKS[value].staff_only and not self.context['request'].user.is_staff:
+            raise serializers.ValidationError(f'Only admins can run {value} jobs.')
+        return value
+
+    def validate_args(self, value):
+
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Expected an object of job arguments.')
+        return value
+
+class ConcessionQuerySerializer(serializers.Serializer):
+
+    """One 'is there an active concession' question, retailer and supplier by code"""
+
+    retailer = serializers.CharField(max_length=4)
+    supplier = serializers.CharField(max_length=4)
+    product = serializers.CharField(max_length=20)
+    date = serializers.DateField(default=timezone.localdate)
@@ -0,0 +1,112 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ops_admin.cache import invalidate_reference
+from ops_admin.events import MODEL_STREAMS, changed
+from ops_admin.models import Order, Retailer, Supplier, Concession, Memo, ManualOrder, Tombstone
+from ops_admin.search import MODEL_KINDS, index, unindex
+from ops_admin.summary import add_orders
+
+SYNCED_MODELS = (Order, Retailer, Supplier, Concession, Memo, ManualOrder)
+
+
+def record_tombstone(sender, instance, **kwargs):
+
+    """Remember the deleted row so /sync/ can tell clients to drop it."""
+
+    Tombstone.objects.create(model=sender._meta.label_lower, object_id=instance.pk)
+
+
+for model in SYNCED_MODELS:
+    post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'tombstone-{model._meta.label_lower}')
+
+
+@receiver(m2m_changed, sender=Retailer.list.through, dispatch_uid='retailer-list-touch')
+def touch_retailer_list(sender, instance, action, reverse, pk_set, **kwargs):
+
+    """Checklist edits don't save the Retailer row, so bump updated_at for /sync/ by hand."""
+
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        retailers = Retailer.objects.filter(pk=instance.pk)
+    elif reverse and action in ('post_add', 'post_remove'):
+        retailers = Retailer.objects.filter(pk__in=pk_set)
+    elif reverse and action == 'pre_clear':
+        retailers = Retailer.objects.filter(list=instance)
+    else:
+        return
+    Retailer.objects.filter(pk__in=list(retailers.values_list('pk', flat=True))).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Supplier, dispatch_uid='supplier-delete-touch')
+def touch_supplier_retailers(sender, instance, **kwargs):
+
+    """Deleting a supplier drops it from checklists through the cascade, without an m2m_changed signal."""
+
+    Retailer.objects.filter(pk__in=list(instance.retailer_set.values_list('pk', flat=True))).update(
+        updated_at=timezone.now()
+    )
+
+
+for model in (Retailer, Supplier):
+    post_save.connect(invalidate_reference, sender=model, dispatch_uid=f'reference-save-{model._meta.label_lower}')
+    post_delete.connect(invalidate_reference, sender=model, dispatch_uid=f'reference-delete-{model._meta.label_lower}')
+m2m_changed.connect(invalidate_reference, sender=Retailer.list.through, dispatch_uid='reference-retailer-list')
+
+
+@receiver(pre_save, sender=Order, dispatch_uid='order-summary-pre-save')
+def remember_order_key(sender, instance, **kwargs):
+
+    """An edit can move an order to another retailer/supplier, note where it was counted before."""
+
+    instance._summary_previous = None
+    if not instance._state.adding:
+        instance._summary_previous = Order.objects.using('default').filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Order, dispatch_uid='order-summary-save')
+def count_saved_order(sender, instance, raw=False, **kwargs):
+
+    if raw:
+        return
+    previous = getattr(instance, '_summary_previous', None)
+    if previous is not None:
+        add_orders([previous], sign=-1)
+    add_orders([instance])
+
+
+@receiver(post_delete, sender=Order, dispatch_uid='order-summary-delete')
+def uncount_deleted_order(sender, instance, **kwargs):
+
+    add_orders([instance], sign=-1)
+
+
+def index_note(sender, instance, **kwargs):
+
+    index(MODEL_KINDS[sender], instance)
+
+
+def unindex_note(sender, instance, **kwargs):
+
+    unindex(MODEL_KINDS[sender], instance.pk)
+
+
+for model in MODEL_KINDS:
+    post_save.connect(index_note, sender=model, dispatch_uid=f'search-save-{model._meta.label_lower}')
+    post_delete.connect(unindex_note, sender=model, dispatch_uid=f'search-delete-{model._meta.label_lower}')
+
+
+def publish_saved(sender, instance, created=False, raw=False, **kwargs):
+
+    if not raw:
+        changed(MODEL_STREAMS[sender], 'created' if created else 'updated', [instance])
+
+
+def publish_deleted(sender, instance, **kwargs):
+
+    changed(MODEL_STREAMS[sender], 'deleted', [instance])
+
+
+for model in MODEL_STREAMS:
+    post_save.connect(publish_saved, sender=model, dispatch_uid=f'events-save-{model._meta.label_lower}')
+    post_delete.connect(publish_deleted, sender=model, dispatch_uid=f'events-delete-{model._meta.label_lower}')
@@ -0,0 +1,73 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ops_admin.models import Order, OrderSummary
+
+
+def summary_key(retailer, supplier, recieved):
+
+    return retailer, supplier, timezone.localtime(recieved).date()
+
+
+def apply(deltas):
+
+    """Add Counter({(retailer, supplier, day): change}) onto the summary, one UPDATE (or INSERT) per key."""
+
+    for (retailer, supplier, day), change in deltas.items():
+        if not change:
+            continue
+        rows = OrderSummary.objects.filter(retailer=retailer, supplier=supplier, day=day)
+        if not rows.update(count=F('count') + change):
+            try:
+                with transaction.atomic():
+                    OrderSummary.objects.create(retailer=retailer, supplier=supplier, day=day, count=change)
+            except IntegrityError:
+                rows.update(count=F('count') + change)
+        if change < 0:
+            rows.filter(count__lte=0).delete()
+
+
+def order_deltas(orders, sign=1):
+
+    """Counter({(retailer, supplier, day): change}) for adding (or with sign=-1 removing) orders."""
+
+    return Counter({
+        key: sign * count
+        for key, count in Counter(summary_key(o.retailer, o.supplier, o.recieved) for o in orders).items()
+    })
+
+
+def add_orders(orders, sign=1):
+
+    apply(order_deltas(orders, sign))
+
+
+def aggregate(queryset):
+
+    """(retailer, supplier, day, count) rows for the orders in queryset, grouped in the database."""
+
+    return (
+        queryset
+        .annotate(day=TruncDate('recieved'))
+        .order_by()
+        .values_list('retailer', 'supplier', 'day')
+        .annotate(count=Count('id'))
+    )
+
+
+@transaction.atomic
+def rebuild(batch_size=1000):
+
+    OrderSummary.objects.all().delete()
+    OrderSummary.objects.bulk_create(
+        (
+            OrderSummary(retailer=retailer, supplier=supplier, day=day, count=count)
+            for retailer, supplier, day, count in aggregate(Order.objects.using('default')).iterator()
+        ),
+        batch_size=batch_size,
+    )
+    return OrderSummary.objects.count()
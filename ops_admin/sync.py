@@ -0,0 +1,121 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from datetime import datetime, timedelta
+
+from django.utils.dateparse import parse_datetime
+
+from ops_admin.models import Order, Retailer, Supplier, Concession, Memo, ManualOrder, Tombstone
+from ops_admin.serializers import OrderSerializer, RetailerSerializer, SupplierSerializer, ConcessionSerializer, \
+                                    MemoSerializer, ManualOrderSerializer
+
+SYNC_SOURCES = {
+    'orders': (Order, OrderSerializer),
+    'retailers': (Retailer, RetailerSerializer),
+    'suppliers': (Supplier, SupplierSerializer),
+    'concessions': (Concession, ConcessionSerializer),
+    'memos': (Memo, MemoSerializer),
+    'manuals': (ManualOrder, ManualOrderSerializer),
+}
+
+# updated_at is stamped when a row is saved, not when its transaction commits, so a write still open when the token
+# is taken (a bulk ingest) can commit a row stamped before it. Tokens are set back by this much to pick those up,
+# clients upsert/delete by id so seeing a row twice is harmless. Writes open longer than this can still be missed.
+SYNC_OVERLAP = timedelta(minutes=5)
+
+SYNC_PAGE_SIZE = 1000
+
+
+def keyset_page(queryset, column, position, size):
+
+    """
+    Up to size rows of queryset in (column, id) order after position, a [value, id] pair or None for the start.
+    Returns the rows and the position to carry on from, None when there's nothing more. Both orderings read
+    straight off the (column) indexes, which end in the id.
+    """
+
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(**{f'{column}__gte': value}).exclude(**{column: value, 'pk__lte': pk})
+    rows = list(queryset.order_by(column, 'pk')[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    if isinstance(last, dict):
+        return rows, [last[column], last['pk']]
+    return rows, [getattr(last, column), last.pk]
+
+
+def changes(key, since=None, position=(None, None), size=SYNC_PAGE_SIZE):
+
+    """
+    One page of the rows of one model changed or deleted at/after since, found through the indexed updated_at and
+    tombstone columns so the cost follows the size of the delta rather than the table. With no since, everything.
+    position is where the previous page of changed rows and of deleted ids stopped (None for the start, False when
+    that side is done). Returns the page and the position for the next one, or None when both sides are done.
+
+    Rows carry their id, which most of the serializers leave out, so clients can upsert/delete their copy.
+    """
+
+    model, serializer_class = SYNC_SOURCES[key]
+    changed_position, deleted_position = position
+    queryset = serializer_class.setup_eager_loading(model.objects.all())
+    tombstones = Tombstone.objects.filter(model=model._meta.label_lower).values('pk', 'object_id', 'deleted_at')
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+        tombstones = tombstones.filter(deleted_at__gte=since)
+    changed, deleted = [], []
+    if changed_position is not False:
+        changed, changed_position = keyset_page(queryset, 'updated_at', changed_position, size)
+    if since is not None and deleted_position is not False:
+        deleted, deleted_position = keyset_page(tombstones, 'deleted_at', deleted_position, size)
+    serializer = serializer_class()
+    page = {
+        'changed': [{'id': obj.pk, **serializer.to_representation(obj)} for obj in changed],
+        'deleted': [tombstone['object_id'] for tombstone in deleted],
+    }
+    position = [
+        False if changed_position is None else changed_position,
+        False if since is None or deleted_position is None else deleted_position,
+    ]
+    return page, None if position == [False, False] else position
+
+
+def encode_cursor(since, token, positions):
+
+    """The ?cursor= for the next /sync/ page: the since and token of the first page and where each model is up to."""
+
+    # Full isoformat(), DjangoJSONEncoder would cut the microseconds the positions are compared on.
+    data = json.dumps({'since': since, 'token': token, 'positions': positions}, default=datetime.isoformat)
+    return urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_position(position):
+
+    if position is None or position is False:
+        return position
+    value, pk = position
+    value = parse_datetime(value)
+    if value is None:
+        raise ValueError('Invalid position.')
+    return [value, int(pk)]
+
+
+def decode_cursor(cursor):
+
+    """(since, token, positions) from encode_cursor(), raising ValueError for anything it didn't make."""
+
+    try:
+        data = json.loads(urlsafe_b64decode(cursor.encode()))
+        since = parse_datetime(data['since']) if data['since'] is not None else None
+        token = parse_datetime(data['token'])
+        positions = {
+            key: [decode_position(changed), decode_position(deleted)]
+            for key, (changed, deleted) in data['positions'].items()
+        }
+    except (Base64Error, UnicodeError, TypeError, KeyError, AttributeError, ValueError) as error:
+        raise ValueError('Invalid cursor.') from error
+    if token is None or any(key not in SYNC_SOURCES for key in positions):
+        raise ValueError('Invalid cursor.')
+    return since, token, positions
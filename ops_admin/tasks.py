@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ops_admin.attachments import process_attachment
+from ops_admin.jobs import task
+from ops_admin.models import Order
+from ops_admin.reconciliation import missing_pairs, applicable_notes, day_bounds
+from ops_admin.renderers import NDJSONRenderer, CSVRenderer
+from ops_admin.sync import SYNC_SOURCES
+
+EXPORT_RENDERERS = {renderer.format: renderer for renderer in (NDJSONRenderer, CSVRenderer)}
+
+
+@task('checklist')
+def checklist(date):
+
+    return list(missing_pairs(parse_date(date)))
+
+
+@task('order_notes', staff_only=True)
+def order_notes(date):
+
+    start, end = day_bounds(parse_date(date))
+    orders = Order.objects.filter(recieved__gte=start, recieved__lt=end).order_by('recieved', 'pk')
+    return applicable_notes(list(orders.values('id', 'ordernum', 'retailer', 'supplier', 'recieved')))
+
+
+@task('export', staff_only=True)
+def export(model, format='csv'):
+
+    """Write a whole table out to MEDIA_ROOT/exports, same rows as the streaming ?format= list views."""
+
+    model_class, serializer_class = SYNC_SOURCES[model]
+    renderer = EXPORT_RENDERERS[format]()
+    queryset = serializer_class.setup_eager_loading(model_class.objects.all())
+    fields, rows = renderer.serialized(queryset, serializer_class)
+    directory = Path(settings.MEDIA_ROOT) / 'exports'
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f'{model}-{timezone.now():%Y%m%d%H%M%S%f}.{renderer.format}'
+    with open(directory / name, 'w', encoding=renderer.charset, newline='') as handle:
+        handle.writelines(renderer.lines(fields, rows))
+    return {'file': f'exports/{name}'}
+
+
+task('process_attachment', internal=True)(process_attachment)
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from ops_admin import views
+from ops_admin import views, async_views
 
 urlpatterns = [
     path('', views.api_root),
@@ -7,14 +7,40 @@ urlpatterns = [
     path('users/<int:pk>/', views.UserDetail.as_view(), name='user-detail'),
     path('orders/', views.order_list, name='order-list'),
     path('orders/<int:pk>/', views.order_detail, name='order-detail'),
+    path('orders/bulk/', views.order_bulk, name='order-bulk'),
+    path('orders/notes/', views.order_notes, name='order-notes'),
+    path('orders/summary/', views.order_summary, name='order-summary'),
     path('retailers/', views.retailer_list, name='retailer-list'),
     path('retailers/<int:pk>', views.retailer_detail, name='retailer-detail'),
+    path('retailers/code/<str:code>', views.retailer_detail, name='retailer-code-detail'),
     path('suppliers/', views.supplier_list, name='supplier-list'),
     path('suppliers/<int:pk>', views.supplier_detail, name='supplier-detail'),
+    path('suppliers/code/<str:code>', views.supplier_detail, name='supplier-code-detail'),
     path('concessions/', views.concession_list, name='concession-list'),
     path('concessions/<int:pk>', views.concession_detail, name='concession-detail'),
+    path('concessions/active/', views.concession_active, name='concession-active'),
     path('memos/', views.memo_list, name='memo-list'),
     path('memos/<int:pk>', views.memo_detail, name='memo-detail'),
     path('manual/', views.manual_list, name='manual-list'),
     path('manual/<int:pk>', views.manual_detail, name='manual-detail'),
+    path('manual/uploads/', views.upload_list, name='upload-list'),
+    path('manual/uploads/<uuid:pk>', views.upload_detail, name='upload-detail'),
+    path('checklist/', views.checklist, name='checklist'),
+    path('sync/', views.sync, name='sync'),
+    path('search/', views.search, name='search'),
+    path('events/', views.events, name='events'),
+    path('jobs/', views.job_list, name='job-list'),
+    path('jobs/<int:pk>/', views.job_detail, name='job-detail'),
+    path('metrics', views.metrics, name='metrics'),
+    path('async/orders/', async_views.resource_list, {'resource': 'orders'}, name='async-order-list'),
+    path('async/orders/<int:pk>/', async_views.resource_detail, {'resource': 'orders'}, name='async-order-detail'),
+    path('async/retailers/', async_views.resource_list, {'resource': 'retailers'}, name='async-retailer-list'),
+    path('async/retailers/<int:pk>/', async_views.resource_detail, {'resource': 'retailers'}, name='async-retailer-detail'),
+    path('async/suppliers/', async_views.resource_list, {'resource': 'suppliers'}, name='async-supplier-list'),
+    path('async/suppliers/<int:pk>/', async_views.resource_detail, {'resource': 'suppliers'}, name='async-supplier-detail'),
+    path('async/concessions/', async_views.resource_list, {'resource': 'concessions'}, name='async-concession-list'),
+    path('async/concessions/<int:pk>/', async_views.resource_detail, {'resource': 'concessions'},
+         name='async-concession-detail'),
+    path('async/memos/', async_views.resource_list, {'resource': 'memos'}, name='async-memo-list'),
+    path('async/memos/<int:pk>/', async_views.resource_detail, {'resource': 'memos'}, name='async-memo-detail'),
 ]
\ No newline at end of file
@@ -1,26 +1,80 @@
+import os
+import re
 from django.contrib.auth.models import User
 from rest_framework import permissions
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, IsAuthenticatedOrReadOnly
 from rest_framework import status
 from rest_framework import generics
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, parser_classes, renderer_classes
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
-from ops_admin.models import Order, Retailer, Supplier, Concession, Memo, ManualOrder
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from ops_admin.models import Order, Retailer, Supplier, Concession, Memo, ManualOrder, Upload, Job, OrderSummary, \
+                             Tombstone
 from ops_admin.serializers import UserSerializer, OrderSerializer, RetailerSerializer, SupplierSerializer, \
-                                    ConcessionSerializer, MemoSerializer, ManualOrderSerializer
+                                    ConcessionSerializer, MemoSerializer, ManualOrderSerializer, ConcessionQuerySerializer, \
+                                    UploadSerializer, JobSerializer, sparse_fields
+from ops_admin.reconciliation import missing_pairs, applicable_notes, day_bounds
+from ops_admin.sync import SYNC_SOURCES, SYNC_OVERLAP, SYNC_PAGE_SIZE, changes, encode_cursor, decode_cursor
+from ops_admin.cache import reference_cache
+from ops_admin.writes import serialized_writes
+from ops_admin.concessions import active_concessions
+from ops_admin.pagination import RecievedCursorPagination, paginated
+from ops_admin.filters import OrderFilter, RetailerFilter, SupplierFilter, ConcessionFilter, MemoFilter, \
+                              ManualOrderFilter
+from ops_admin.parsers import NDJSONParser
+from ops_admin.renderers import StreamingRenderer, NDJSONRenderer, CSVRenderer, PrometheusRenderer, EventStreamRenderer
+from ops_admin.metrics import REGISTRY
+from ops_admin.summary import add_orders
+from ops_admin.search import KINDS, search as search_notes
+from ops_admin.events import STREAMS, EventStreamResponse, changed
+from ops_admin.attachments import receive_chunk, append_chunk, finish_upload, partial_path
 
 
 class UserList(generics.ListAPIView):
-    queryset = User.objects.all()
+    queryset = UserSerializer.setup_eager_loading(User.objects.all())
     serializer_class = UserSerializer
 
 
 class UserDetail(generics.RetrieveAPIView):
-    queryset = User.objects.all()
+    queryset = UserSerializer.setup_eager_loading(User.objects.all())
     serializer_class = UserSerializer
 
 
+def row_errors(errors):
+
+    """Errors from a many=True serializer, as the index and errors of just the rows that failed."""
+
+    if isinstance(errors, list):
+        return [{'row': index, 'errors': error} for index, error in enumerate(errors) if error]
+    return errors
+
+
+def query_date(request):
+
+    """?date=YYYY-MM-DD, today if not given, None if it doesn't parse."""
+
+    date = request.query_params.get('date')
+    try:
+        return parse_date(date) if date else timezone.localdate()
+    except ValueError:
+        return None
+
+
+def lookup(pk, code):
+
+    """Filter kwargs for detail views routed either by primary key or by 4 char code."""
+
+    return {'pk': pk} if pk is not None else {'code': code}
+
+
 """
 
 API ROOT
@@ -40,6 +94,12 @@ def api_root(request, format=None):
         'concessions': reverse('concession-list', request=request, format=format),
         'memos': reverse('memo-list', request=request, format=format),
         'manual orders': reverse('manual-list', request=request, format=format),
+        'checklist': reverse('checklist', request=request, format=format),
+        'sync': reverse('sync', request=request, format=format),
+        'jobs': reverse('job-list', request=request, format=format),
+        'search': reverse('search', request=request, format=format),
+        'events': reverse('events', request=request),
+        'metrics': reverse('metrics', request=request),
     })
 
 """
@@ -50,33 +110,45 @@ ORDER VIEWS
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAdminUser])
+@renderer_classes([*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer, CSVRenderer])
+@serialized_writes
 def order_list(request, format=None):
     
-    """List all orders or create new."""
+    """
+    List orders or create new. ?format=ndjson or ?format=csv streams every matching order as a download.
+    Filter and sort with the OrderFilter parameters (?retailer=, ?date=, ?ordering=-recieved, ...).
+    """
     
     if request.method == 'GET':
-        orders = Order.objects.all()
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        filters = OrderFilter.from_request(request)
+        orders = OrderSerializer.setup_eager_loading(filters.filter(Order.objects.all()), **sparse_fields(request))
+        if isinstance(request.accepted_renderer, StreamingRenderer):
+            return request.accepted_renderer.stream(orders, OrderSerializer, 'orders', **sparse_fields(request))
+        return paginated(request, orders, OrderSerializer, RecievedCursorPagination, filters.order_by())
     elif request.method == 'POST':
         serializer = OrderSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(owner=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAdminUser])
+@serialized_writes
 def order_detail(request, pk, format=None):
 
     """Read, update, delete an order"""
     
+    # Reads go to the replica, if there is one. A read to write from has to see the latest row, so only the primary.
+    orders = Order.objects.all() if request.method in permissions.SAFE_METHODS else Order.objects.using('default')
+    # A sparse GET loads just the columns it renders, anything else works on the whole row.
+    fields = sparse_fields(request) if request.method == 'GET' else {}
     try:
-        order = Order.objects.get(pk=pk)
+        order = OrderSerializer.setup_eager_loading(orders, **fields).get(pk=pk)
     except Order.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
     if request.method == 'GET':
-        serializer = OrderSerializer(order)
+        serializer = OrderSerializer(order, **fields)
         return Response(serializer.data)
     elif request.method == 'PUT':
         serializer = OrderSerializer(order, data=request.data)
@@ -88,6 +160,82 @@ def order_detail(request, pk, format=None):
         order.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+@api_view(['POST', 'PATCH', 'DELETE'])
+@permission_classes([IsAdminUser])
+@parser_classes([JSONParser, NDJSONParser])
+@serialized_writes
+def order_bulk(request, format=None):
+
+    """
+    Bulk create (POST), update (PATCH, each row with its id) or delete (DELETE, {"ids": [...]}) orders from the WMS feed.
+    Takes a JSON array or an application/x-ndjson body. All rows are written in one transaction, or none are and
+    the invalid rows are returned with their index.
+    """
+
+    if request.method == 'DELETE':
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list):
+            return Response({'ids': ['Expected a list of order ids.']}, status=status.HTTP_400_BAD_REQUEST)
+        # Without the per-row delete signals: the tombstones, summary and events are written once for the batch.
+        # Nothing references Order, so there's no cascade to skip.
+        with transaction.atomic():
+            orders = []
+            for start in range(0, len(ids), 500):
+                rows = Order.objects.using('default').filter(pk__in=ids[start:start + 500])
+                orders += rows.only('pk', 'retailer', 'supplier', 'recieved')
+                rows._raw_delete('default')
+            Tombstone.objects.bulk_create([Tombstone(model=Order._meta.label_lower, object_id=o.pk) for o in orders])
+            add_orders(orders, sign=-1)
+            changed('orders', 'deleted', orders)
+        return Response({'deleted': len(orders)})
+    rows = request.data
+    if request.method == 'PATCH':
+        ids = [row['id'] for row in rows if isinstance(row, dict) and isinstance(row.get('id'), int)] \
+            if isinstance(rows, list) else []
+        serializer = OrderSerializer(Order.objects.using('default').in_bulk(ids), data=rows, many=True, partial=True)
+    else:
+        serializer = OrderSerializer(data=rows, many=True)
+    if not serializer.is_valid():
+        return Response(row_errors(serializer.errors), status=status.HTTP_400_BAD_REQUEST)
+    with transaction.atomic():
+        orders = serializer.save(owner=request.user) if request.method == 'POST' else serializer.save()
+        changed('orders', 'created' if request.method == 'POST' else 'updated', orders)
+    if request.method == 'POST':
+        return Response({'created': len(orders)}, status=status.HTTP_201_CREATED)
+    return Response({'updated': len(orders)})
+
+# Longest ?start= to ?end= range order_summary answers, a row per retailer/supplier pair per day adds up quickly.
+SUMMARY_MAX_DAYS = 31
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def order_summary(request, format=None):
+
+    """
+    Order counts per retailer/supplier for ?date=YYYY-MM-DD (defaults to today), or each day from ?start= to ?end=,
+    at most SUMMARY_MAX_DAYS days. Narrow with ?retailer= / ?supplier= codes. Read from the summary table, not by
+    counting orders.
+    """
+
+    params = request.query_params
+    try:
+        start = parse_date(params['start']) if 'start' in params else query_date(request)
+        end = parse_date(params['end']) if 'end' in params else start
+    except ValueError:
+        start = end = None
+    if start is None or end is None:
+        return Response({'date': ['Date has wrong format. Use YYYY-MM-DD.']}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 <= (end - start).days < SUMMARY_MAX_DAYS:
+        return Response(
+            {'end': [f'Expected an end on or after the start, at most {SUMMARY_MAX_DAYS} days in all.']},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    summary = OrderSummary.objects.filter(day__gte=start, day__lte=end).order_by('day', 'retailer', 'supplier')
+    for code in ('retailer', 'supplier'):
+        if code in params:
+            summary = summary.filter(**{code: params[code]})
+    return Response(list(summary.values('day', 'retailer', 'supplier', 'count')))
+
 """
 
 RETAILER VIEWS
@@ -96,33 +244,38 @@ RETAILER VIEWS
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@reference_cache
+@serialized_writes
 def retailer_list(request, format=None):
     
-    """List all retailers or create new."""
+    """List retailers (see RetailerFilter for the query parameters) or create new."""
     
     if request.method == 'GET':
-        retailers = Retailer.objects.all()
-        serializer = RetailerSerializer(retailers, many=True)
-        return Response(serializer.data)
+        filters = RetailerFilter.from_request(request)
+        retailers = RetailerSerializer.setup_eager_loading(filters.filter(Retailer.objects.all()), **sparse_fields(request))
+        return paginated(request, retailers, RetailerSerializer, ordering=filters.order_by())
     elif request.method == 'POST':
         serializer = RetailerSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(owner=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
-def retailer_detail(request, pk, format=None):
+@reference_cache
+@serialized_writes
+def retailer_detail(request, pk=None, code=None, format=None):
 
-    """Read, update, delete a retailer"""
+    """Read, update, delete a retailer, looked up by id or by code"""
     
+    fields = sparse_fields(request) if request.method == 'GET' else {}
     try:
-        retailer = Retailer.objects.get(pk=pk)
+        retailer = RetailerSerializer.setup_eager_loading(Retailer.objects.all(), **fields).get(**lookup(pk, code))
     except Retailer.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
     if request.method == 'GET':
-        serializer = RetailerSerializer(retailer)
+        serializer = RetailerSerializer(retailer, **fields)
         return Response(serializer.data)
     elif request.method == 'PUT':
         serializer = RetailerSerializer(retailer, data=request.data)
@@ -148,33 +301,38 @@ SUPPLIER VIEWS
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
+@reference_cache
+@serialized_writes
 def supplier_list(request, format=None):
     
-    """List all suppliers or create new."""
+    """List suppliers (see SupplierFilter for the query parameters) or create new."""
     
     if request.method == 'GET':
-        suppliers = Supplier.objects.all()
-        serializer = SupplierSerializer(suppliers, many=True)
-        return Response(serializer.data)
+        filters = SupplierFilter.from_request(request)
+        suppliers = SupplierSerializer.setup_eager_loading(filters.filter(Supplier.objects.all()), **sparse_fields(request))
+        return paginated(request, suppliers, SupplierSerializer, ordering=filters.order_by())
     elif request.method == 'POST':
         serializer = SupplierSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(owner=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
-def supplier_detail(request, pk, format=None):
+@reference_cache
+@serialized_writes
+def supplier_detail(request, pk=None, code=None, format=None):
 
-    """Read, update, delete a supplier"""
+    """Read, update, delete a supplier, looked up by id or by code"""
     
+    fields = sparse_fields(request) if request.method == 'GET' else {}
     try:
-        supplier = Supplier.objects.get(pk=pk)
-    except supplier.DoesNotExist:
+        supplier = SupplierSerializer.setup_eager_loading(Supplier.objects.all(), **fields).get(**lookup(pk, code))
+    except Supplier.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
     if request.method == 'GET':
-        serializer = SupplierSerializer(supplier)
+        serializer = SupplierSerializer(supplier, **fields)
         return Response(serializer.data)
     elif request.method == 'PUT':
         serializer = SupplierSerializer(supplier, data=request.data)
@@ -195,34 +353,66 @@ CONCESSION VIEWS
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@renderer_classes([*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer, CSVRenderer])
+@serialized_writes
 def concession_list(request, format=None):
     
-    """List all concessions or create new."""
+    """
+    List concessions or create new. ?format=ndjson or ?format=csv streams every matching concession as a download.
+    Filter and sort with the ConcessionFilter parameters (?retailer=, ?active_on=, ?ends_before=, ...).
+    """
     
     if request.method == 'GET':
-        concessions = Concession.objects.all()
-        serializer = ConcessionSerializer(concessions, many=True)
-        return Response(serializer.data)
+        filters = ConcessionFilter.from_request(request)
+        concessions = ConcessionSerializer.setup_eager_loading(
+            filters.filter(Concession.objects.all()), **sparse_fields(request)
+        )
+        if isinstance(request.accepted_renderer, StreamingRenderer):
+            return request.accepted_renderer.stream(concessions, ConcessionSerializer, 'concessions', **sparse_fields(request))
+        return paginated(request, concessions, ConcessionSerializer, ordering=filters.order_by())
     elif request.method == 'POST':
         serializer = ConcessionSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(owner=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def concession_active(request, format=None):
+
+    """
+    Is there an active concession for ?retailer=&supplier=&product=&date= (codes, date defaults to today).
+    POST a list of the same {retailer, supplier, product, date} objects to check a batch in one call.
+    """
+
+    many = request.method == 'POST'
+    serializer = ConcessionQuerySerializer(data=request.data if many else request.query_params, many=many)
+    if not serializer.is_valid():
+        return Response(row_errors(serializer.errors), status=status.HTTP_400_BAD_REQUEST)
+    queries = serializer.validated_data if many else [serializer.validated_data]
+    results = [
+        {**query, 'active': bool(concessions), 'concessions': concessions}
+        for query, concessions in zip(queries, active_concessions(queries))
+    ]
+    return Response(results if many else results[0])
+
+
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@serialized_writes
 def concession_detail(request, pk, format=None):
 
     """Read, update, delete a concession"""
     
+    fields = sparse_fields(request) if request.method == 'GET' else {}
     try:
-        concession = Concession.objects.get(pk=pk)
+        concession = ConcessionSerializer.setup_eager_loading(Concession.objects.all(), **fields).get(pk=pk)
     except Concession.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
     if request.method == 'GET':
-        serializer = ConcessionSerializer(concession)
+        serializer = ConcessionSerializer(concession, **fields)
         return Response(serializer.data)
     elif request.method == 'PUT':
         serializer = ConcessionSerializer(concession, data=request.data)
@@ -249,34 +439,37 @@ CONCESSION MEMO VIEWS
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@serialized_writes
 def memo_list(request, format=None):
     
-    """List all memos or create new."""
+    """List memos (see MemoFilter for the query parameters) or create new."""
     
     if request.method == 'GET':
-        memos = Memo.objects.all()
-        serializer = MemoSerializer(memos, many=True)
-        return Response(serializer.data)
+        filters = MemoFilter.from_request(request)
+        memos = MemoSerializer.setup_eager_loading(filters.filter(Memo.objects.all()), **sparse_fields(request))
+        return paginated(request, memos, MemoSerializer, ordering=filters.order_by())
     elif request.method == 'POST':
         serializer = MemoSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(owner=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@serialized_writes
 def memo_detail(request, pk, format=None):
 
     """Read, update, delete a memo"""
     
+    fields = sparse_fields(request) if request.method == 'GET' else {}
     try:
-        memo = Memo.objects.get(pk=pk)
+        memo = MemoSerializer.setup_eager_loading(Memo.objects.all(), **fields).get(pk=pk)
     except Memo.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
     if request.method == 'GET':
-        serializer = MemoSerializer(memo)
+        serializer = MemoSerializer(memo, **fields)
         return Response(serializer.data)
     elif request.method == 'PUT':
         serializer = MemoSerializer(memo, data=request.data)
@@ -302,47 +495,387 @@ MANUAL ORDER VIEWS
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@serialized_writes
 def manual_list(request, format=None):
     
-    """List all manual orders or create new."""
+    """List manual orders (see ManualOrderFilter for the query parameters) or create new."""
     
     if request.method == 'GET':
-        manuals = ManualOrder.objects.all()
-        serializer = ManualOrderSerializer(manuals, many=True)
-        return Response(serializer.data)
+        filters = ManualOrderFilter.from_request(request)
+        manuals = ManualOrderSerializer.setup_eager_loading(
+            filters.filter(ManualOrder.objects.all()), **sparse_fields(request)
+        )
+        return paginated(request, manuals, ManualOrderSerializer, ordering=filters.order_by())
     elif request.method == 'POST':
         serializer = ManualOrderSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(owner=request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@serialized_writes
 def manual_detail(request, pk, format=None):
 
     """Read, update, delete a manual order"""
     
+    fields = sparse_fields(request) if request.method == 'GET' else {}
     try:
-        manual = ManualOrder.objects.get(pk=pk)
-    except Manual.DoesNotExist:
+        manual = ManualOrderSerializer.setup_eager_loading(ManualOrder.objects.all(), **fields).get(pk=pk)
+    except ManualOrder.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
     if request.method == 'GET':
-        serializer = ManualSerializer(manual)
+        serializer = ManualOrderSerializer(manual, **fields)
         return Response(serializer.data)
     elif request.method == 'PUT':
-        serializer = ManualSerializer(manual, data=request.data)
+        serializer = ManualOrderSerializer(manual, data=request.data)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     elif request.method == 'PATCH':
-        serializer = ManualSerializer(manual, data=request.data, partial=True)
+        serializer = ManualOrderSerializer(manual, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     elif request.method == 'DELETE':
         manual.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@serialized_writes
+def upload_list(request, format=None):
+
+    """
+    Start a resumable upload for a manual order attachment: {filename, size, content_type, manual}.
+    Then PUT the file to the returned upload in chunks with a Content-Range header.
+    """
+
+    serializer = UploadSerializer(data=request.data)
+    if serializer.is_valid():
+        serializer.save(owner=request.user)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_detail(request, pk, format=None):
+
+    """
+    GET the offset to resume from, PUT the next chunk (raw body, Content-Range: bytes start-end/size) or DELETE
+    to abandon. The chunk goes straight to disk, when the last one lands the file is deduplicated by content hash
+    and attached to the manual order, with text/thumbnail extraction left to a background worker.
+    """
+
+    try:
+        upload = Upload.objects.get(pk=pk, owner=request.user)
+    except Upload.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        serializer = UploadSerializer(upload)
+        return Response(serializer.data)
+    elif request.method == 'PUT':
+        if upload.complete:
+            return Response(UploadSerializer(upload).data)
+        match = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+        if match is None or int(match[3]) != upload.size:
+            return Response({'Content-Range': [f'Expected bytes start-end/{upload.size}.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if int(match[1]) != upload.offset:
+            return Response(UploadSerializer(upload).data, status=status.HTTP_409_CONFLICT)
+        chunk, received = receive_chunk(upload, request.stream)
+        try:
+            with transaction.atomic():
+                # Claim the range: of two PUTs from the same offset only one matches here, the other gets a 409.
+                claimed = Upload.objects.filter(pk=upload.pk, offset=upload.offset).update(
+                    offset=upload.offset + received, updated_at=timezone.now()
+                )
+                if claimed:
+                    append_chunk(upload, chunk)
+                    upload.offset += received
+                    if upload.complete:
+                        finish_upload(upload)
+                        upload.save()
+        finally:
+            if os.path.exists(chunk):
+                os.remove(chunk)
+        if not claimed:
+            upload.refresh_from_db()
+            return Response(UploadSerializer(upload).data, status=status.HTTP_409_CONFLICT)
+        return Response(UploadSerializer(upload).data)
+    elif request.method == 'DELETE':
+        if not upload.complete and os.path.exists(partial_path(upload)):
+            os.remove(partial_path(upload))
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+"""
+
+RECONCILIATION VIEWS
+
+"""
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def order_notes(request, format=None):
+
+    """
+    The concessions and memos (ids) applying to each order recieved on ?date=YYYY-MM-DD (defaults to today),
+    or to the orders listed in ?ids=1,2,3.
+    """
+
+    ids = request.query_params.get('ids')
+    orders = Order.objects.order_by('recieved', 'pk').values('id', 'ordernum', 'retailer', 'supplier', 'recieved')
+    if ids:
+        try:
+            ids = [int(pk) for pk in ids.split(',')]
+        except ValueError:
+            return Response({'ids': ['Expected a comma separated list of order ids.']}, status=status.HTTP_400_BAD_REQUEST)
+        orders = [order for start in range(0, len(ids), 500) for order in orders.filter(pk__in=ids[start:start + 500])]
+    else:
+        day = query_date(request)
+        if day is None:
+            return Response({'date': ['Date has wrong format. Use YYYY-MM-DD.']}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = day_bounds(day)
+        orders = list(orders.filter(recieved__gte=start, recieved__lt=end))
+    return Response(applicable_notes(orders))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def checklist(request, format=None):
+
+    """Checklist entries (retailer/supplier pairs) with no order recieved on ?date=YYYY-MM-DD, defaults to today."""
+
+    day = query_date(request)
+    if day is None:
+        return Response({'date': ['Date has wrong format. Use YYYY-MM-DD.']}, status=status.HTTP_400_BAD_REQUEST)
+    missing = [
+        {
+            'retailer': pair['retailer__code'],
+            'retailer_name': pair['retailer__name'],
+            'supplier': pair['supplier__code'],
+            'supplier_name': pair['supplier__name'],
+        }
+        for pair in missing_pairs(day)
+    ]
+    return Response({'date': day, 'missing': missing})
+
+
+"""
+
+SYNC VIEWS
+
+"""
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync(request, format=None):
+
+    """
+    Rows created, changed or deleted since ?since=<token>, the token being the one handed back by the previous call.
+    No token returns everything. ?models=memos,concessions limits the models returned, orders are admin only.
+    Up to ?page_size= (default and max 1000) rows and deleted ids per model: while "next" is set, follow it for
+    the rest, and keep the token once it's null. Rows can come round twice, upsert them by id.
+    """
+
+    params = request.query_params
+    if params.get('cursor'):
+        try:
+            since, token, positions = decode_cursor(params['cursor'])
+        except ValueError:
+            return Response({'cursor': ['Invalid cursor.']}, status=status.HTTP_400_BAD_REQUEST)
+    else:
+        since = params.get('since') or None
+        if since is not None:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                return Response({'since': ['Invalid sync token.']}, status=status.HTTP_400_BAD_REQUEST)
+        keys = params.get('models')
+        keys = [key.strip() for key in keys.split(',')] if keys else list(SYNC_SOURCES)
+        unknown = [key for key in keys if key not in SYNC_SOURCES]
+        if unknown:
+            return Response({'models': [f'Unknown model {key}.' for key in unknown]}, status=status.HTTP_400_BAD_REQUEST)
+        token = timezone.now() - SYNC_OVERLAP
+        positions = {key: [None, None] for key in keys}
+    if not request.user.is_staff:
+        positions.pop('orders', None)
+    try:
+        size = max(1, min(int(params.get('page_size', SYNC_PAGE_SIZE)), SYNC_PAGE_SIZE))
+    except ValueError:
+        return Response({'page_size': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+    data, remaining = {}, {}
+    for key, position in positions.items():
+        data[key], position = changes(key, since, position, size)
+        if position is not None:
+            remaining[key] = position
+    next_url = None
+    if remaining:
+        url = remove_query_param(remove_query_param(request.build_absolute_uri(), 'since'), 'models')
+        next_url = replace_query_param(url, 'cursor', encode_cursor(since, token, remaining))
+    return Response({'token': token, 'next': next_url, **data})
+
+
+"""
+
+JOB VIEWS
+
+"""
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+@serialized_writes
+def job_list(request, format=None):
+
+    """List your jobs (admins see everyone's) or enqueue one: {"kind": "export", "args": {"model": "orders"}}."""
+
+    if request.method == 'GET':
+        jobs = JobSerializer.setup_eager_loading(Job.objects.all(), **sparse_fields(request))
+        if not request.user.is_staff:
+            jobs = jobs.filter(owner=request.user)
+        return paginated(request, jobs, JobSerializer)
+    elif request.method == 'POST':
+        serializer = JobSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            serializer.save(owner=request.user)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+@serialized_writes
+def job_detail(request, pk, format=None):
+
+    """Poll a job, or DELETE to cancel it while it's still queued."""
+
+    fields = sparse_fields(request) if request.method == 'GET' else {}
+    jobs = JobSerializer.setup_eager_loading(Job.objects.all(), **fields)
+    if not request.user.is_staff:
+        jobs = jobs.filter(owner=request.user)
+    try:
+        job = jobs.get(pk=pk)
+    except Job.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        serializer = JobSerializer(job, **fields)
+        return Response(serializer.data)
+    elif request.method == 'DELETE':
+        if not Job.objects.filter(pk=job.pk, status=Job.QUEUED).delete()[0]:
+            return Response(JobSerializer(job).data, status=status.HTTP_409_CONFLICT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+"""
+
+SEARCH VIEWS
+
+"""
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request, format=None):
+
+    """
+    Full text search of memos, concessions and manual orders: ?q=words, best match first with a snippet.
+    Narrow with ?kinds=memos,concessions, ?retailer= / ?supplier= codes and ?limit= (default 20, 1 to 100).
+    """
+
+    params = request.query_params
+    if not params.get('q', '').strip():
+        return Response({'q': ['Search text is required.']}, status=status.HTTP_400_BAD_REQUEST)
+    kinds = [kind.strip() for kind in params['kinds'].split(',')] if params.get('kinds') else None
+    unknown = [kind for kind in kinds or () if kind not in KINDS]
+    if unknown:
+        return Response({'kinds': [f'Unknown kind {kind}.' for kind in unknown]}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = max(1, min(int(params.get('limit', 20)), 100))
+    except ValueError:
+        return Response({'limit': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+    filters = {}
+    for key, model in (('retailer', Retailer), ('supplier', Supplier)):
+        if key in params:
+            filters[f'{key}_id'] = model.objects.filter(code=params[key]).values_list('pk', flat=True).first()
+            if filters[f'{key}_id'] is None:
+                return Response([])
+    hits = search_notes(params['q'], kinds, limit=limit, **filters)
+    retailers = dict(Retailer.objects.filter(pk__in={hit['retailer_id'] for hit in hits}).values_list('pk', 'code'))
+    suppliers = dict(Supplier.objects.filter(pk__in={hit['supplier_id'] for hit in hits}).values_list('pk', 'code'))
+    return Response([
+        {
+            'kind': hit['kind'],
+            'id': hit['id'],
+            'retailer': retailers.get(hit['retailer_id']),
+            'supplier': suppliers.get(hit['supplier_id']),
+            'snippet': hit['snippet'],
+            'score': hit['score'],
+        }
+        for hit in hits
+    ])
+
+
+"""
+
+EVENT VIEWS
+
+"""
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def events(request, format=None):
+
+    """
+    Server-sent events as orders, concessions and memos are created, updated and deleted, see ops_admin.events.
+    ?kinds=orders,concessions,memos (default all, orders for admins only), ?retailer= / ?supplier= codes.
+    Resumes from the Last-Event-ID header, or ?last_event_id= for clients that can't set it.
+    """
+
+    if not isinstance(request._request, ASGIRequest):
+        return Response({'detail': 'The event stream is only served through webapi.asgi.'},
+                        status=status.HTTP_501_NOT_IMPLEMENTED)
+    params = request.query_params
+    readable = [kind for kind in STREAMS if kind != 'orders' or IsAdminUser().has_permission(request, None)]
+    if params.get('kinds'):
+        kinds = [kind.strip() for kind in params['kinds'].split(',')]
+        unknown = [kind for kind in kinds if kind not in STREAMS]
+        if unknown:
+            return Response({'kinds': [f'Unknown kind {kind}.' for kind in unknown]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not set(kinds) <= set(readable):
+            return Response({'detail': 'Only admins can follow orders.'}, status=status.HTTP_403_FORBIDDEN)
+    else:
+        kinds = readable
+    return EventStreamResponse(
+        kinds,
+        retailer=params.get('retailer'),
+        supplier=params.get('supplier'),
+        last_event_id=request.META.get('HTTP_LAST_EVENT_ID') or params.get('last_event_id'),
+    )
+
+
+"""
+
+METRICS VIEWS
+
+"""
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@renderer_classes([PrometheusRenderer])
+def metrics(request, format=None):
+
+    """Request metrics for this process in the Prometheus text format, see ops_admin.metrics."""
+
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,51 @@
+import random
+import threading
+import time
+from functools import wraps
+
+from django.db import OperationalError, transaction
+
+WRITE_LOCK = threading.RLock()
+RETRIES = 5
+BACKOFF = 0.05
+
+
+def locked(exc):
+
+    return 'database is locked' in str(exc) or 'database is busy' in str(exc)
+
+
+def run_serialized(func, *args, using=None, **kwargs):
+
+    """
+    Run a write, one at a time per process, retrying with jittered exponential backoff while SQLite reports the
+    database locked by another process. The process lock keeps this process's own threads from fighting over the
+    SQLite write lock at all, the retries cover the other processes. Each attempt is its own transaction, so a
+    retry never repeats half of a write.
+    """
+
+    for attempt in range(RETRIES + 1):
+        try:
+            with WRITE_LOCK, transaction.atomic(using=using):
+                return func(*args, **kwargs)
+        except OperationalError as exc:
+            if attempt == RETRIES or not locked(exc):
+                raise
+        time.sleep(BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def serialized_writes(view):
+
+    """
+    run_serialized() for the unsafe methods of a view, goes directly above the view function. A retry re-runs the
+    view, DRF has cached the parsed request.data by then so that's safe - don't use it on views reading request.stream.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return view(request, *args, **kwargs)
+        return run_serialized(view, request, *args, **kwargs)
+
+    return wrapper
@@ -9,8 +9,13 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'webapi.settings')
 
-application = get_asgi_application()
+# As django.core.asgi.get_asgi_application(), with the handler that can also stream /events/.
+django.setup(set_prefix=False)
+
+from ops_admin.events import ASGIHandler  # noqa: E402 (needs the apps loaded)
+
+application = ASGIHandler()
@@ -0,0 +1,31 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    """
+    Django's sqlite3 backend with a production profile for several ops terminals sharing one db.sqlite3:
+
+    - OPTIONS['pragmas'] are applied to every new connection (WAL journal, synchronous, cache_size, mmap_size...),
+      Django 3.1 has no init_command for SQLite.
+    - Transactions open with BEGIN IMMEDIATE, taking the write lock up front. A plain (deferred) BEGIN that reads
+      and then tries to write fails at once with "database is locked" if another writer got in between, since
+      SQLite can't wait on a lock upgrade; an immediate one just waits out OPTIONS['timeout'] like any other lock.
+    """
+
+    def get_connection_params(self):
+
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -31,11 +33,16 @@ ALLOWED_HOSTS = []
 # Application definition
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'ops_admin.pagination.IdCursorPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # The columnar MessagePack format for the terminals, when msgpack is installed.
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['ops_admin.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
 }
 
 INSTALLED_APPS = [
@@ -51,6 +58,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'ops_admin.metrics.MetricsMiddleware',
+    'ops_admin.compression.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -85,10 +94,57 @@ WSGI_APPLICATION = 'webapi.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# webapi.db is the stock sqlite3 backend plus per-connection pragmas and BEGIN IMMEDIATE transactions, see
+# webapi/db/base.py. WAL lets the ops terminals keep reading while one of them writes, 'timeout' is how long a
+# writer waits for the lock (ops_admin.writes retries beyond that) and CONN_MAX_AGE keeps connections open
+# between requests instead of reconnecting and re-running the pragmas every time.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'webapi.db',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 20,
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'cache_size': -64000,
+                'mmap_size': 268435456,
+                'temp_store': 'MEMORY',
+            },
+        },
+    }
+}
+
+# Optional read only copy of db.sqlite3 that Order reads and the order reconciliation queries are routed to, see
+# ops_admin/routers.py. Keeping the copy fresh is up to whatever produces it. Tests just read the default database.
+
+ORDERS_REPLICA = os.environ.get('ORDERS_REPLICA')
+
+if ORDERS_REPLICA:
+    DATABASES['orders_replica'] = {
+        **DATABASES['default'],
+        'NAME': f'file:{ORDERS_REPLICA}?mode=ro',
+        'OPTIONS': {
+            'timeout': 20,
+            'pragmas': {'cache_size': -64000, 'mmap_size': 268435456, 'query_only': 'ON'},
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['ops_admin.routers.OrderReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Retailer/supplier responses are cached until the signals in ops_admin.signals invalidate them. Local memory is
+# per process, so when running more than one worker switch to the file based backend so they all see invalidations:
+# 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': BASE_DIR / 'cache'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -131,6 +187,11 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Manual order attachments, plus partial files for uploads still in progress
+
+MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_URL = '/media/'
+
 CORS_ORIGIN_WHITELIST = [
     'https://localhost:3000'
 ]
\ No newline at end of file